@@ -1,17 +1,70 @@
 # ADB.py
 import numpy as np
-import random
-import time
 import threading
-import matplotlib.pyplot as plt
+import os
+import sys
+from itertools import chain
+
+
+def _import_pyplot():
+    # pyplot se importa al graficar, no al crear el agente; sin pantalla (Linux sin X11/Wayland)
+    # se fija Agg para no intentar iniciar Tk/Qt en ejecuciones por lotes
+    if 'matplotlib.pyplot' not in sys.modules and not os.environ.get('MPLBACKEND') and \
+            sys.platform.startswith('linux') and not (os.environ.get('DISPLAY') or os.environ.get('WAYLAND_DISPLAY')):
+        import matplotlib
+        matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    return plt
+
+
+def _moving_average(values, window):
+    # Media móvil 'valid' con sumas acumuladas: O(n) sin importar el tamaño de ventana
+    cumsum = np.cumsum(np.asarray(values, dtype=float))
+    cumsum[window:] = cumsum[window:] - cumsum[:-window]
+    return cumsum[window - 1:] / window
+
+
+def _smoothed_rewards(rewards):
+    # Devuelve (episodios, recompensas suavizadas, ventana) o None si hay pocos datos
+    if len(rewards) < 20:
+        return None
+    window_size = min(50, max(10, len(rewards) // 10))
+    smoothed = _moving_average(rewards, window_size)
+    # Cada valor suavizado se asocia al último episodio (base 1) de su ventana
+    return np.arange(window_size, window_size + len(smoothed)), smoothed, window_size
+
+
+# Pasos por bloque de sorteos en _train_one_episode: un episodio corto no paga por
+# max_steps_per_episode números, y uno largo hace pocas llamadas al generador
+_EPISODE_DRAW_BLOCK = 64
+
+
+class _LazyValidActions(dict):
+    # Acciones válidas por celda (índice y*W+x) que se calculan con get_valid_actions la primera
+    # vez que se consultan; se indexa igual que la tabla de _build_valid_actions_table
+    def __init__(self, agent, obstacles):
+        super().__init__()
+        self.agent = agent
+        self.obstacles = obstacles
+
+    def __missing__(self, cell):
+        y, x = divmod(cell, self.agent.width)
+        valid_actions = self[cell] = self.agent.get_valid_actions((x, y), self.obstacles)
+        return valid_actions
 
 
 class QLearningAgent:
+    _obstacle_cmap = None  # Se crea una vez y se comparte entre instancias y gráficos
+
     def __init__(self, width, height, num_actions=4):
         self.width = width
         self.height = height
         self.num_actions = num_actions
-        self.q_table = np.zeros((height, width, num_actions), dtype=float)
+        # Generador propio para toda la aleatoriedad del agente (exploración, desempates e
+        # inicios de episodio); permite sortear los números de un episodio en bloque
+        self.rng = np.random.default_rng()
+        # float32: la mitad de memoria que float64 y precisión de sobra para recompensas acotadas
+        self.q_table = np.zeros((height, width, num_actions), dtype=np.float32)
 
         self.learning_rate = 0.1
         self.discount_factor = 0.9
@@ -32,69 +85,151 @@ class QLearningAgent:
         self.current_training_iteration = 0
         self.max_training_iterations = 1000  # Puede necesitar ser mayor para grids grandes
 
+        # Límite de pasos al simular la política aprendida (depende solo del tamaño de la cuadrícula)
+        self._policy_sim_max_steps = width * height * 2
+        # Posiciones de ticks de la cuadrícula (el tamaño no cambia durante la ejecución)
+        self._grid_xticks = np.arange(width)
+        self._grid_yticks = np.arange(height)
+        # Figura de mapas Q reutilizable: (fig, imágenes por acción)
+        self._q_heatmap_figure = None
+
+    def _build_obstacle_mask(self, obstacles):
+        # Máscara booleana (alto, ancho) de obstáculos para los plots
+        # Coordenadas como array (K, 2) leído de una pasada, sin lista intermedia de tuplas
+        coords = np.fromiter(chain.from_iterable(obstacles), dtype=np.int64,
+                             count=2 * len(obstacles)).reshape(-1, 2)
+        xs, ys = coords[:, 0], coords[:, 1]
+        in_bounds = (xs >= 0) & (xs < self.width) & (ys >= 0) & (ys < self.height)
+        # Un único scatter sobre índices lineales y*W+x del buffer plano
+        mask = np.zeros(self.height * self.width, dtype=bool)
+        mask[ys[in_bounds] * self.width + xs[in_bounds]] = True
+        return mask.reshape(self.height, self.width)
+
+    @classmethod
+    def _get_obstacle_cmap(cls):
+        if cls._obstacle_cmap is None:
+            from matplotlib.colors import ListedColormap
+            cls._obstacle_cmap = ListedColormap(['dimgray'])
+        return cls._obstacle_cmap
+
+    def _draw_obstacles(self, ax, obstacles):
+        # Una sola imagen para todos los obstáculos en vez de un Rectangle por celda
+        obstacle_mask = self._build_obstacle_mask(obstacles)
+        ax.imshow(np.ma.masked_where(~obstacle_mask, obstacle_mask, copy=False), cmap=self._get_obstacle_cmap(),
+                  interpolation='nearest', extent=(-0.5, self.width - 0.5, self.height - 0.5, -0.5), zorder=2)
+
+    @staticmethod
+    def _mark_endpoints(ax, start_pos, goal_pos, start_label, goal_label, start_size, goal_size):
+        # Inicio y objetivo en una sola colección (un artista, un paso de dibujo) con un marcador por punto
+        from matplotlib.lines import Line2D
+        from matplotlib.markers import MarkerStyle
+        marker_paths = []
+        for marker in ('s', '*'):
+            marker_style = MarkerStyle(marker)
+            marker_paths.append(marker_style.get_path().transformed(marker_style.get_transform()))
+        endpoints = ax.scatter([start_pos[0], goal_pos[0]], [start_pos[1], goal_pos[1]],
+                               s=[start_size ** 2, goal_size ** 2], c=['blue', 'green'], zorder=4)
+        endpoints.set_paths(marker_paths)
+        # La colección no distingue etiquetas por punto: entradas de leyenda aparte, sin datos
+        return [Line2D([], [], linestyle='', marker='s', markersize=start_size, color='blue', label=start_label),
+                Line2D([], [], linestyle='', marker='*', markersize=goal_size, color='green', label=goal_label)]
+
     def _is_valid(self, pos, obstacles):
         x, y = pos
         return 0 <= x < self.width and 0 <= y < self.height and pos not in obstacles
 
+    def _build_obstacle_grid(self, obstacles):
+        # Rejilla plana de ocupación (índice y*W+x, 1 = obstáculo) para el entrenamiento: consultar
+        # un byte evita crear y hashear una tupla por vecino
+        obstacle_grid = bytearray(self.width * self.height)
+        for x, y in obstacles:
+            if 0 <= x < self.width and 0 <= y < self.height:
+                obstacle_grid[y * self.width + x] = 1
+        return obstacle_grid
+
+    def _build_valid_actions_table(self, obstacles):
+        # Acciones válidas de cada celda (índice y*W+x), calculadas una vez por entrenamiento:
+        # los obstáculos no cambian y cada paso pasa a ser una sola consulta a la lista
+        obstacle_grid = self._build_obstacle_grid(obstacles)
+        return [self._valid_actions_from_grid((x, y), obstacle_grid)
+                for y in range(self.height) for x in range(self.width)]
+
     def get_valid_actions(self, state_pos, obstacles):
+        current_x, current_y = state_pos
+        width, height = self.width, self.height
         valid_action_indices = []
+        for action_idx, (dx, dy) in enumerate(self.actions_xy):
+            next_x, next_y = current_x + dx, current_y + dy
+            if 0 <= next_x < width and 0 <= next_y < height and (next_x, next_y) not in obstacles:
+                valid_action_indices.append(action_idx)
+        return valid_action_indices
+
+    def _valid_actions_from_grid(self, state_pos, obstacle_grid):
+        # Como get_valid_actions, pero sobre la rejilla de _build_obstacle_grid
         current_x, current_y = state_pos
+        width, height = self.width, self.height
+        valid_action_indices = []
         for action_idx, (dx, dy) in enumerate(self.actions_xy):
             next_x, next_y = current_x + dx, current_y + dy
-            if self._is_valid((next_x, next_y), obstacles):
+            if 0 <= next_x < width and 0 <= next_y < height and not obstacle_grid[next_y * width + next_x]:
                 valid_action_indices.append(action_idx)
         return valid_action_indices
 
+    @staticmethod
+    def _random_valid_action(valid_actions, draw):
+        # Acción válida uniforme a partir de un número ya sorteado en [0, 1)
+        if not valid_actions: return None
+        return valid_actions[int(draw * len(valid_actions))]
+
+    def _greedy_action(self, state_pos, valid_actions):
+        # Acción válida de mayor Q para una posición dentro del grid; los empates con el máximo
+        # se resuelven al azar
+        if not valid_actions: return None
+        # Q de las acciones válidas en una sola lectura indexada
+        valid_q_values = self.q_table[state_pos[1], state_pos[0], valid_actions]
+        best_actions_tied = np.flatnonzero(valid_q_values == valid_q_values.max())
+        if len(best_actions_tied) == 1:
+            return valid_actions[best_actions_tied[0]]
+        return valid_actions[best_actions_tied[self.rng.integers(len(best_actions_tied))]]
+
     def choose_action(self, state_pos, obstacles, is_training_exploration=True, target_pos=None):
-        if is_training_exploration and random.random() < self.epsilon:
-            valid_actions = self.get_valid_actions(state_pos, obstacles)
-            if not valid_actions: return None
-            return random.choice(valid_actions)
+        if is_training_exploration and self.rng.random() < self.epsilon:
+            # Se prueba directamente una acción al azar; solo si es inválida se enumeran las
+            # válidas. La distribución sigue siendo uniforme sobre las acciones válidas
+            action_idx = int(self.rng.integers(len(self.actions_xy)))
+            dx, dy = self.actions_xy[action_idx]
+            next_x, next_y = state_pos[0] + dx, state_pos[1] + dy
+            if 0 <= next_x < self.width and 0 <= next_y < self.height and (next_x, next_y) not in obstacles:
+                return action_idx
+            return self._random_valid_action(self.get_valid_actions(state_pos, obstacles), self.rng.random())
         else:
             current_x, current_y = state_pos
             if not (0 <= current_y < self.q_table.shape[0] and 0 <= current_x < self.q_table.shape[1]):
                 valid_actions_fallback = self.get_valid_actions(state_pos, obstacles)
-                return random.choice(valid_actions_fallback) if valid_actions_fallback else None
-
-            q_values_for_state = self.q_table[current_y, current_x, :]
-            valid_actions = self.get_valid_actions(state_pos, obstacles)
-            if not valid_actions: return None
-
-            best_q = -float('inf')
-            best_actions_tied = []
+                return self._random_valid_action(valid_actions_fallback, self.rng.random())
 
-            for action_idx in valid_actions:
-                if q_values_for_state[action_idx] > best_q:
-                    best_q = q_values_for_state[action_idx]
-                    best_actions_tied = [action_idx]
-                elif q_values_for_state[action_idx] == best_q:
-                    best_actions_tied.append(action_idx)
-
-            if not best_actions_tied:
-                return random.choice(valid_actions) if valid_actions else None
-
-            return random.choice(best_actions_tied)
+            return self._greedy_action(state_pos, self.get_valid_actions(state_pos, obstacles))
 
     def update_q_value(self, state_pos, action_idx, reward, next_state_pos, obstacles, done):
-        current_x, current_y = state_pos
         next_x, next_y = next_state_pos
+        if done or not (0 <= next_y < self.q_table.shape[0] and 0 <= next_x < self.q_table.shape[1]):
+            valid_next_actions = None
+        else:
+            valid_next_actions = self.get_valid_actions(next_state_pos, obstacles)
+        self._apply_q_update(state_pos, action_idx, reward, next_state_pos, valid_next_actions)
 
+    def _apply_q_update(self, state_pos, action_idx, reward, next_state_pos, valid_next_actions):
+        # valid_next_actions vacío o None: estado terminal (o sin salida), sin valor futuro
+        current_x, current_y = state_pos
         if not (0 <= current_y < self.q_table.shape[0] and 0 <= current_x < self.q_table.shape[1]):
             return
-        if not (0 <= next_y < self.q_table.shape[0] and 0 <= next_x < self.q_table.shape[1]):
-            done = True
 
         old_q_value = self.q_table[current_y, current_x, action_idx]
 
-        if done:
+        if not valid_next_actions:
             max_future_q = 0.0
         else:
-            valid_next_actions = self.get_valid_actions(next_state_pos, obstacles)
-            if not valid_next_actions:
-                max_future_q = 0.0
-            else:
-                future_q_values = [self.q_table[next_y, next_x, na_idx] for na_idx in valid_next_actions]
-                max_future_q = max(future_q_values) if future_q_values else 0.0
+            max_future_q = self.q_table[next_state_pos[1], next_state_pos[0], valid_next_actions].max()
 
         new_q_value = old_q_value + self.learning_rate * \
                       (reward + self.discount_factor * max_future_q - old_q_value)
@@ -120,41 +255,71 @@ class QLearningAgent:
         return reward
 
     def train_one_episode(self, agent_start_pos, target_pos, obstacles, max_steps_per_episode=300):  # MODIFICADO
+        # Episodio suelto: las acciones válidas se calculan solo para las celdas que se visitan,
+        # sin construir la tabla de todo el grid en cada llamada
+        return self._train_one_episode(agent_start_pos, target_pos, _LazyValidActions(self, obstacles),
+                                       max_steps_per_episode)
+
+    def _train_one_episode(self, agent_start_pos, target_pos, valid_actions_table, max_steps_per_episode=300):
+        # Episodio sobre la tabla de _build_valid_actions_table: cada paso consulta las acciones
+        # válidas con un acceso a la lista en vez de recorrer los vecinos
+        if not (0 <= agent_start_pos[0] < self.width and 0 <= agent_start_pos[1] < self.height):
+            # Inicio fuera del grid: el índice plano caería en otra fila (o fuera de la tabla);
+            # se penaliza como un episodio sin movimientos válidos
+            return -20, 0
         agent_current_pos = agent_start_pos
-        agent_prev_pos = agent_start_pos
+        agent_prev_pos = agent_start_pos  # En el primer paso coincide con el inicio
         episode_reward = 0
         path_len = 0
-        initial_pos_for_reward_calc = agent_start_pos  # Para el primer paso
+        width = self.width
+        # Métodos en locales: el bucle se ejecuta cientos de veces por episodio
+        greedy_action, calculate_reward = self._greedy_action, self.calculate_reward
+        apply_q_update, actions_xy = self._apply_q_update, self.actions_xy
+        random_valid_action, epsilon = self._random_valid_action, self.epsilon
+        rng_random = self.rng.random
+        # Sorteos del episodio en bloques de _EPISODE_DRAW_BLOCK pasos (epsilon no cambia hasta
+        # terminarlo): si se explora en cada paso y qué acción aleatoria se toma. Cada bloque se
+        # limita a los pasos restantes, así que nunca se sortean más de max_steps_per_episode
+        block_size = min(_EPISODE_DRAW_BLOCK, max_steps_per_episode)
+        explore_draws = rng_random(block_size).tolist()
+        action_draws = rng_random(block_size).tolist()
+        draw_idx = 0
 
         for step in range(max_steps_per_episode):
             if self.stop_training_flag: break
 
-            action_idx = self.choose_action(agent_current_pos, obstacles, is_training_exploration=True,
-                                            target_pos=target_pos)
+            if draw_idx == block_size:
+                block_size = min(_EPISODE_DRAW_BLOCK, max_steps_per_episode - step)
+                explore_draws = rng_random(block_size).tolist()
+                action_draws = rng_random(block_size).tolist()
+                draw_idx = 0
+
+            # Solo se eligen acciones dentro del grid y fuera de obstáculos, así que la siguiente
+            # posición no necesita volver a validarse (las listas de la tabla son compartidas:
+            # no se modifican)
+            valid_actions = valid_actions_table[agent_current_pos[1] * width + agent_current_pos[0]]
+            if explore_draws[draw_idx] < epsilon:
+                action_idx = random_valid_action(valid_actions, action_draws[draw_idx])
+            else:
+                action_idx = greedy_action(agent_current_pos, valid_actions)
+            draw_idx += 1
 
             if action_idx is None:
                 episode_reward -= 20
                 break
 
-            dx, dy = self.actions_xy[action_idx]
+            dx, dy = actions_xy[action_idx]
             agent_next_pos = (agent_current_pos[0] + dx, agent_current_pos[1] + dy)
 
-            if not self._is_valid(agent_next_pos, obstacles) and agent_next_pos != target_pos:
-                reward_val = -50
-                self.update_q_value(agent_current_pos, action_idx, reward_val, agent_current_pos, obstacles, True)
-                episode_reward += reward_val
-                break
-
             path_len += 1
             caught_or_reached_target = (agent_next_pos == target_pos)
 
-            reward_prev_pos = agent_prev_pos if step > 0 else initial_pos_for_reward_calc
-            reward_val = self.calculate_reward(agent_next_pos, target_pos, reward_prev_pos, step,
-                                               caught_or_reached_target)
+            reward_val = calculate_reward(agent_next_pos, target_pos, agent_prev_pos, step, caught_or_reached_target)
             episode_reward += reward_val
 
-            self.update_q_value(agent_current_pos, action_idx, reward_val, agent_next_pos, obstacles,
-                                caught_or_reached_target)
+            valid_next_actions = None if caught_or_reached_target else \
+                valid_actions_table[agent_next_pos[1] * width + agent_next_pos[0]]
+            apply_q_update(agent_current_pos, action_idx, reward_val, agent_next_pos, valid_next_actions)
 
             agent_prev_pos = agent_current_pos
             agent_current_pos = agent_next_pos
@@ -185,6 +350,10 @@ class QLearningAgent:
         def training_worker():
             print(
                 f"Hilo Q-learning (trabajador) iniciado. Objetivo: {target_pos_for_training}, Inicio Agente: {initial_agent_pos_for_training}, Iter Máx: {self.max_training_iterations}")
+            # Los obstáculos no cambian durante el entrenamiento: se convierten una sola vez
+            valid_actions_table = self._build_valid_actions_table(obstacles)
+            # Intervalo de impresión (10 veces en total), invariante durante el entrenamiento
+            print_interval = self.max_training_iterations // 10 if self.max_training_iterations >= 10 else 1
 
             for i in range(self.max_training_iterations):
                 if self.stop_training_flag:
@@ -196,8 +365,8 @@ class QLearningAgent:
                                       obstacles) or current_agent_start_pos == target_pos_for_training:
                     temp_start_pos_found = False
                     for _try_start in range(100):
-                        temp_x = random.randint(0, self.width - 1)
-                        temp_y = random.randint(0, self.height - 1)
+                        temp_x = int(self.rng.integers(self.width))
+                        temp_y = int(self.rng.integers(self.height))
                         candidate_start_pos = (temp_x, temp_y)
                         if self._is_valid(candidate_start_pos,
                                           obstacles) and candidate_start_pos != target_pos_for_training:
@@ -208,7 +377,8 @@ class QLearningAgent:
                         # print(f"Q-Train: No se pudo encontrar posición inicial aleatoria válida. Omitiendo episodio {i+1}.")
                         continue
 
-                reward, path_len = self.train_one_episode(current_agent_start_pos, target_pos_for_training, obstacles)
+                reward, path_len = self._train_one_episode(current_agent_start_pos, target_pos_for_training,
+                                                           valid_actions_table)
                 self.current_training_iteration = i + 1
 
                 self.training_history['path_lengths'].append(path_len)
@@ -222,13 +392,10 @@ class QLearningAgent:
                     callback(self.current_training_iteration, None, self.training_history, None,
                              is_final=False)  # MOD: is_final=False
 
-                if self.current_training_iteration % (
-                self.max_training_iterations // 10 if self.max_training_iterations >= 10 else 1) == 0:  # Print 10 times
+                if self.current_training_iteration % print_interval == 0:
                     print(
                         f"Q-Train iter {self.current_training_iteration}: Ep_Reward={reward:.2f}, PathLen={path_len}, Epsilon={self.epsilon:.4f}, BestRew={self.best_reward:.2f}")
 
-                time.sleep(0.00001)  # Ligerisima pausa
-
             print(
                 f"Hilo Q-learning (trabajador): Entrenamiento finalizado o detenido. Iteraciones: {self.current_training_iteration}")
             if callback:
@@ -254,11 +421,12 @@ class QLearningAgent:
         return False
 
     def plot_analysis(self, show=True, save_path=None):
+        if not show and not save_path: return None  # Sin ventana ni archivo: no hay que construir la figura
         if not self.training_history['rewards']:
             print("ADB.py: No hay datos de entrenamiento para plot_analysis.")
-            if show and plt.get_fignums(): plt.close('all')
             return
 
+        plt = _import_pyplot()
         fig, axs = plt.subplots(2, 1, figsize=(12, 8), sharex=True)
         episodes = range(1, len(self.training_history['rewards']) + 1)
 
@@ -268,19 +436,11 @@ class QLearningAgent:
         axs[0].tick_params(axis='y', labelcolor=color_reward)
         axs[0].grid(True, linestyle=':', alpha=0.5)
 
-        if len(self.training_history['rewards']) >= 20:
-            window_size = min(50, max(10, len(self.training_history['rewards']) // 10))
-            if window_size > 1:  # Asegurar que la ventana es al menos 2 para convolve
-                kernel = np.ones(window_size) / window_size
-                smoothed_rewards = np.convolve(np.array(self.training_history['rewards']), kernel,
-                                               'valid')  # Asegurar que es np.array
-                # Ajustar el eje x para la línea suavizada
-                smoothed_x_rewards = range(window_size - 1 + (window_size // 2) - (window_size // 2 - 1),
-                                           window_size - 1 + len(smoothed_rewards))  # Corrección
-                if len(smoothed_x_rewards) == len(smoothed_rewards) and len(
-                        smoothed_rewards) > 0:  # Chequeo de longitud
-                    axs[0].plot(smoothed_x_rewards, smoothed_rewards, label=f'Recompensa Suavizada ({window_size}ep)',
-                                color='firebrick', linewidth=1.5)  # MOD: linewidth
+        smoothed = _smoothed_rewards(self.training_history['rewards'])
+        if smoothed is not None:
+            smoothed_x_rewards, smoothed_rewards, window_size = smoothed
+            axs[0].plot(smoothed_x_rewards, smoothed_rewards, label=f'Recompensa Suavizada ({window_size}ep)',
+                        color='firebrick', linewidth=1.5)  # MOD: linewidth
         axs[0].legend(loc='best')
         axs[0].set_title('Recompensa por Episodio')
 
@@ -303,30 +463,43 @@ class QLearningAgent:
             plt.close(fig)
         return fig
 
-    def plot_q_values_heatmap(self, show=True, save_path=None):
-        # ... (sin cambios significativos) ...
+    def _build_q_values_heatmap_figure(self):
+        plt = _import_pyplot()
         fig, axs = plt.subplots(2, 2, figsize=(11, 9))
         axs = axs.flatten()
-        cmap = 'viridis'
+        images = []
+        for i in range(self.num_actions):
+            im = axs[i].imshow(self.q_table[:, :, i], cmap='viridis', origin='lower')
+            axs[i].set_title(f'Valores Q para: {self.action_names[i]}')
+            axs[i].set_xlabel('Posición X')
+            axs[i].set_ylabel('Posición Y')
+            fig.colorbar(im, ax=axs[i], orientation='vertical', label='Valor Q')
+            images.append(im)
+
+        fig.suptitle("Mapas de Calor de Q-Values por Acción", fontsize=16)
+        fig.tight_layout(rect=[0, 0, 1, 0.95])
+        return fig, images
 
+    def plot_q_values_heatmap(self, show=True, save_path=None):
+        if not show and not save_path: return None
         min_q_overall = np.min(self.q_table)
         max_q_overall = np.max(self.q_table)
         if min_q_overall == max_q_overall:
             min_q_overall -= 0.1
             max_q_overall += 0.1
 
-        for i in range(self.num_actions):
-            q_values_action = self.q_table[:, :, i]
-            im = axs[i].imshow(q_values_action, cmap=cmap, vmin=min_q_overall, vmax=max_q_overall, origin='lower')
-            axs[i].set_title(f'Valores Q para: {self.action_names[i]}')
-            axs[i].set_xlabel('Posición X')
-            axs[i].set_ylabel('Posición Y')
-            fig.colorbar(im, ax=axs[i], orientation='vertical', label='Valor Q')
+        plt = _import_pyplot()
+        # Se reutiliza la figura previa (solo se actualizan datos y escala); se reconstruye
+        # si hay que mostrarla y su ventana ya fue cerrada
+        if self._q_heatmap_figure is None or (show and not plt.fignum_exists(self._q_heatmap_figure[0].number)):
+            self._q_heatmap_figure = self._build_q_values_heatmap_figure()
+        fig, images = self._q_heatmap_figure
 
-        fig.suptitle("Mapas de Calor de Q-Values por Acción", fontsize=16)
-        plt.tight_layout(rect=[0, 0, 1, 0.95])
+        for i, im in enumerate(images):
+            im.set_data(self.q_table[:, :, i])
+            im.set_clim(min_q_overall, max_q_overall)
 
-        if save_path: plt.savefig(save_path)
+        if save_path: fig.savefig(save_path)
         if show:
             plt.show()
         else:
@@ -334,13 +507,12 @@ class QLearningAgent:
         return fig
 
     def plot_best_path(self, agent_sim_start_pos, target_pos, obstacles, show=True, save_path=None):
+        if not show and not save_path: return None
         # ... (sin cambios significativos) ...
         simulated_path = []
         current_pos = agent_sim_start_pos
         simulated_path.append(current_pos)
-        max_steps_for_plot = self.width * self.height * 2
-
-        for _ in range(max_steps_for_plot):
+        for _ in range(self._policy_sim_max_steps):
             if current_pos == target_pos: break
             action_direction_xy = self.get_learned_action_xy(current_pos, obstacles, target_pos=target_pos)
 
@@ -355,26 +527,26 @@ class QLearningAgent:
             if len(simulated_path) > 1 and simulated_path[-1] == simulated_path[-2]:
                 break
 
+        plt = _import_pyplot()
         fig, ax = plt.subplots(figsize=(self.width * 0.5 + 1, self.height * 0.5 + 1))
         ax.set_xlim(-0.5, self.width - 0.5)
         ax.set_ylim(self.height - 0.5, -0.5)
-        ax.set_xticks(np.arange(self.width))
-        ax.set_yticks(np.arange(self.height))
+        ax.set_xticks(self._grid_xticks)
+        ax.set_yticks(self._grid_yticks)
         ax.grid(True, linestyle=':', alpha=0.7)
 
-        for obs_x, obs_y in obstacles:
-            ax.add_patch(plt.Rectangle((obs_x - 0.5, obs_y - 0.5), 1, 1, color='dimgray', zorder=2))
+        self._draw_obstacles(ax, obstacles)
 
         if simulated_path:
-            path_x = [p[0] for p in simulated_path]
-            path_y = [p[1] for p in simulated_path]
+            # Columnas x/y de un único array contiguo en vez de recorrer las tuplas dos veces
+            path_x, path_y = np.asarray(simulated_path, dtype=np.int32).T
             ax.plot(path_x, path_y, 'r-o', linewidth=1.5, markersize=4,
                     label=f'Camino por Política Q ({len(simulated_path) - 1} pasos)', zorder=3)
 
-        ax.plot(agent_sim_start_pos[0], agent_sim_start_pos[1], 'bs', markersize=8, label='Inicio Agente (Simulación)',
-                zorder=4)
-        ax.plot(target_pos[0], target_pos[1], 'g*', markersize=12, label='Objetivo', zorder=4)
-        ax.legend(loc='best')
+        endpoint_handles = self._mark_endpoints(ax, agent_sim_start_pos, target_pos, 'Inicio Agente (Simulación)',
+                                                'Objetivo', 8, 12)
+        path_handles, _ = ax.get_legend_handles_labels()
+        ax.legend(handles=path_handles + endpoint_handles, loc='best')
         ax.set_title('Camino Simulado Usando Política Q Aprendida')
         ax.set_aspect('equal', adjustable='box')
 
@@ -388,12 +560,13 @@ class QLearningAgent:
 
     def plot_comprehensive_analysis(self, agent_target_pos, agent_initial_pos_for_sim, obstacles, show=True,
                                     save_path=None):
+        if not show and not save_path: return None
         # ... (sin cambios significativos, solo la corrección del plot de recompensa suavizada que ya estaba) ...
         if not self.training_history['rewards']:
             print("ADB.py: No hay datos de entrenamiento para plot_comprehensive_analysis.")
-            if show and plt.get_fignums(): plt.close('all')
             return
 
+        plt = _import_pyplot()
         fig = plt.figure(figsize=(17, 15))
         gs = fig.add_gridspec(3, 2, height_ratios=[1, 1.5, 1.5])
 
@@ -408,19 +581,12 @@ class QLearningAgent:
             ax_progress.tick_params(axis='y', labelcolor=color_reward)
             ax_progress.grid(True, linestyle=':', alpha=0.6)
 
-            if len(self.training_history['rewards']) >= 20:
-                win_size_rew = min(50, max(10, len(self.training_history['rewards']) // 10))
-                if win_size_rew > 1:
-                    kernel_rew = np.ones(win_size_rew) / win_size_rew
-                    smoothed_rewards_vals = np.convolve(np.array(self.training_history['rewards']), kernel_rew, 'valid')
-                    smoothed_rewards_x = np.arange(win_size_rew - 1,
-                                                   win_size_rew - 1 + len(smoothed_rewards_vals))  # Corrección eje X
-                    # Otra forma para el eje x: smoothed_rewards_x = range(win_size_rew//2, win_size_rew//2 + len(smoothed_rewards_vals))
-
-                    if len(smoothed_rewards_x) == len(smoothed_rewards_vals) and len(smoothed_rewards_vals) > 0:
-                        ax_progress.plot(smoothed_rewards_x, smoothed_rewards_vals,
-                                         label=f'Recompensa Suavizada ({win_size_rew}ep)', color='crimson',
-                                         linewidth=1.5)
+            smoothed = _smoothed_rewards(self.training_history['rewards'])
+            if smoothed is not None:
+                smoothed_rewards_x, smoothed_rewards_vals, win_size_rew = smoothed
+                ax_progress.plot(smoothed_rewards_x, smoothed_rewards_vals,
+                                 label=f'Recompensa Suavizada ({win_size_rew}ep)', color='crimson',
+                                 linewidth=1.5)
 
             ax_epsilon = ax_progress.twinx()
             color_epsilon = 'forestgreen'
@@ -438,7 +604,7 @@ class QLearningAgent:
         sim_path_coords = []
         curr_p = agent_initial_pos_for_sim
         sim_path_coords.append(curr_p)
-        for _ in range(self.width * self.height * 2):
+        for _ in range(self._policy_sim_max_steps):
             if curr_p == agent_target_pos: break
             act_dir_xy = self.get_learned_action_xy(curr_p, obstacles, target_pos=agent_target_pos)
             if not act_dir_xy: break
@@ -450,18 +616,18 @@ class QLearningAgent:
 
         ax_path_sim.set_xlim(-0.5, self.width - 0.5);
         ax_path_sim.set_ylim(self.height - 0.5, -0.5)
-        ax_path_sim.set_xticks(np.arange(self.width));
-        ax_path_sim.set_yticks(np.arange(self.height))
+        ax_path_sim.set_xticks(self._grid_xticks);
+        ax_path_sim.set_yticks(self._grid_yticks)
         ax_path_sim.grid(True, linestyle=':', alpha=0.7)
-        for ox, oy in obstacles: ax_path_sim.add_patch(
-            plt.Rectangle((ox - 0.5, oy - 0.5), 1, 1, color='dimgray', zorder=2))
-        if sim_path_coords: ax_path_sim.plot([p[0] for p in sim_path_coords], [p[1] for p in sim_path_coords],
-                                             'crimson', marker='o', ms=3, lw=1.5,
-                                             label=f'Ruta Simulada ({len(sim_path_coords) - 1} pasos)', zorder=3)
-        ax_path_sim.plot(agent_initial_pos_for_sim[0], agent_initial_pos_for_sim[1], 'bs', ms=7,
-                         label='Inicio Agente (Sim.)', zorder=4)
-        ax_path_sim.plot(agent_target_pos[0], agent_target_pos[1], 'g*', ms=10, label='Objetivo Agente', zorder=4)
-        ax_path_sim.legend(fontsize='small');
+        self._draw_obstacles(ax_path_sim, obstacles)
+        if sim_path_coords:
+            sim_path_x, sim_path_y = np.asarray(sim_path_coords, dtype=np.int32).T
+            ax_path_sim.plot(sim_path_x, sim_path_y, 'crimson', marker='o', ms=3, lw=1.5,
+                             label=f'Ruta Simulada ({len(sim_path_coords) - 1} pasos)', zorder=3)
+        endpoint_handles = self._mark_endpoints(ax_path_sim, agent_initial_pos_for_sim, agent_target_pos,
+                                                'Inicio Agente (Sim.)', 'Objetivo Agente', 7, 10)
+        path_handles, _ = ax_path_sim.get_legend_handles_labels()
+        ax_path_sim.legend(handles=path_handles + endpoint_handles, fontsize='small');
         ax_path_sim.set_title('Camino Simulado por Política Q');
         ax_path_sim.set_aspect('equal', adjustable='box')
 
@@ -474,26 +640,18 @@ class QLearningAgent:
         ax_q_max_heatmap.set_ylabel('Y')
 
         q_min_plot = np.min(self.q_table)
-        q_max_plot = np.max(self.q_table)
+        q_max_plot = np.max(max_q_values_per_state)  # Máximo global ya reducido por estado
         if q_min_plot == q_max_plot: q_max_plot += 0.1
 
-        ax_q_action1 = fig.add_subplot(gs[2, 0])
-        action1_idx = 2  # Abajo
-        im_a1 = ax_q_action1.imshow(self.q_table[:, :, action1_idx], cmap='coolwarm', vmin=q_min_plot, vmax=q_max_plot,
-                                    origin='lower', aspect='auto')
-        fig.colorbar(im_a1, ax=ax_q_action1, label=f'Valor Q ({self.action_names[action1_idx]})')
-        ax_q_action1.set_title(f'Mapa de Calor Q para Acción "{self.action_names[action1_idx]}"');
-        ax_q_action1.set_xlabel('X');
-        ax_q_action1.set_ylabel('Y')
-
-        ax_q_action2 = fig.add_subplot(gs[2, 1])
-        action2_idx = 1  # Derecha
-        im_a2 = ax_q_action2.imshow(self.q_table[:, :, action2_idx], cmap='coolwarm', vmin=q_min_plot, vmax=q_max_plot,
-                                    origin='lower', aspect='auto')
-        fig.colorbar(im_a2, ax=ax_q_action2, label=f'Valor Q ({self.action_names[action2_idx]})')
-        ax_q_action2.set_title(f'Mapa de Calor Q para Acción "{self.action_names[action2_idx]}"');
-        ax_q_action2.set_xlabel('X');
-        ax_q_action2.set_ylabel('Y')
+        # Mismo mapa para "Abajo" y "Derecha": vistas del q_table con una escala común
+        for grid_cell, action_idx in ((gs[2, 0], 2), (gs[2, 1], 1)):
+            ax_q_action = fig.add_subplot(grid_cell)
+            im_action = ax_q_action.imshow(self.q_table[:, :, action_idx], cmap='coolwarm', vmin=q_min_plot,
+                                           vmax=q_max_plot, origin='lower', aspect='auto')
+            fig.colorbar(im_action, ax=ax_q_action, label=f'Valor Q ({self.action_names[action_idx]})')
+            ax_q_action.set_title(f'Mapa de Calor Q para Acción "{self.action_names[action_idx]}"');
+            ax_q_action.set_xlabel('X');
+            ax_q_action.set_ylabel('Y')
 
         fig.suptitle(f"Análisis Comprensivo del Agente Q-learning (Entrenado para alcanzar {agent_target_pos})",
                      fontsize=18)
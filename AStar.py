@@ -1,5 +1,249 @@
 from config import GameConfig
+from functools import lru_cache
+from heapq import heappop, heappush
 import math
+from itertools import count
+import numpy as np
+
+
+def _cell_heuristic(cell, goal_x, goal_y, width):
+    """
+    Distancia Manhattan desde una celda (índice lineal y * width + x) hasta la meta.
+
+    Args:
+        cell (int): Índice lineal de la celda.
+        goal_x (int): Columna de la meta.
+        goal_y (int): Fila de la meta.
+        width (int): Ancho del grid.
+
+    Returns:
+        int: Distancia Manhattan entre la celda y la meta.
+    """
+    y, x = divmod(cell, width)
+    return abs(x - goal_x) + abs(y - goal_y)
+
+
+@lru_cache(maxsize=None)
+def _cell_offsets(width, height):
+    """
+    Precalcula, para cada celda, los desplazamientos de vecino que quedan dentro del grid.
+
+    Con índices lineales cada dirección es un desplazamiento fijo (-width, +1, +width, -1);
+    la única dependencia de la posición es qué direcciones se salen del borde. Se calcula
+    una sola vez por tamaño de grid, así la búsqueda no hace divmod ni comparaciones de
+    límites por nodo expandido.
+
+    Args:
+        width (int): Ancho del grid.
+        height (int): Alto del grid.
+
+    Returns:
+        tuple: Para cada celda, tupla de desplazamientos válidos en orden
+               Arriba, Derecha, Abajo, Izquierda.
+    """
+    offsets = []
+    for y in range(height):
+        for x in range(width):
+            cell_offsets = []
+            if y > 0:
+                cell_offsets.append(-width)  # Arriba
+            if x < width - 1:
+                cell_offsets.append(1)  # Derecha
+            if y < height - 1:
+                cell_offsets.append(width)  # Abajo
+            if x > 0:
+                cell_offsets.append(-1)  # Izquierda
+            offsets.append(tuple(cell_offsets))
+    return tuple(offsets)
+
+
+def _astar_core(blocked_grid, width, height, start_cell, goal_cell):
+    """
+    Núcleo de A* sobre índices enteros de celda.
+
+    Solo maneja enteros y estructuras locales (sin tuplas de posición ni atributos de
+    instancia en el bucle), lo que reduce el trabajo del intérprete por nodo expandido.
+    Las celdas se codifican como y * width + x.
+
+    Args:
+        blocked_grid (bytearray): Rejilla de ocupación (1 = bloqueada).
+        width (int): Ancho del grid.
+        height (int): Alto del grid.
+        start_cell (int): Índice lineal del inicio.
+        goal_cell (int): Índice lineal de la meta.
+
+    Returns:
+        tuple or None: (padre de cada celda (índice lineal, -1 si no tiene), costo del
+                       camino hasta la meta) si se alcanzó la meta, None si no existe camino.
+    """
+    goal_y, goal_x = divmod(goal_cell, width)
+    cell_offsets = _cell_offsets(width, height)
+
+    # Cola de cubetas indexada por f en lugar de un heap binario. Con costo unitario y
+    # heurística consistente, f nunca decrece a lo largo de la búsqueda: basta avanzar un
+    # puntero hasta la primera cubeta no vacía, e insertar y extraer cuestan O(1) sin
+    # comparar tuplas. Dentro de una cubeta se extrae en orden LIFO, que favorece la celda
+    # descubierta más recientemente (mayor g, menor h) y evita abrirse en abanico por las
+    # mesetas de f igual. La cubeta k guarda las celdas con f = start_h + k
+    start_h = _cell_heuristic(start_cell, goal_x, goal_y, width)
+    buckets = [[start_cell]]
+    bucket_index = 0
+    # Banderas por celda en lugar de conjuntos: consultar un byte no requiere hashear
+    cell_count = width * height
+    # Nodos ya explorados. Parte como copia de la rejilla: las celdas bloqueadas cuentan como
+    # cerradas desde el inicio y nunca se relajan
+    closed = bytearray(blocked_grid)
+
+    # Padres en un arreglo plano indexado por celda: sin hash ni redimensionado de diccionario
+    came_from = [-1] * cell_count
+    # Costo desde el inicio, también plano por celda. Sustituye al conjunto abierto: una celda
+    # no alcanzada conserva un costo mayor que cualquier camino real (a lo sumo cell_count - 1),
+    # así que una sola lectura decide si conviene relajarla
+    g_score = [cell_count] * cell_count
+    g_score[start_cell] = 0
+
+    while True:
+        # Avanzar hasta la primera cubeta con celdas pendientes
+        bucket = buckets[bucket_index]
+        while not bucket:
+            bucket_index += 1
+            if bucket_index == len(buckets):
+                # Todas las cubetas vacías: no se encontró camino
+                return None
+            bucket = buckets[bucket_index]
+        current = bucket.pop()
+
+        # Borrado perezoso: una celda mejorada después de insertarse deja una entrada
+        # obsoleta en una cubeta posterior, que se descarta aquí
+        if closed[current]:
+            continue
+
+        if current == goal_cell:
+            return came_from, g_score[current]
+
+        closed[current] = 1
+
+        # Costo uniforme para todas las casillas válidas
+        tentative_g_score = g_score[current] + 1
+
+        # Vecinos en línea (sin llamada ni lista intermedia): las celdas bloqueadas ya están
+        # marcadas como cerradas, así que una sola consulta descarta ambas
+        for offset in cell_offsets[current]:
+            neighbor = current + offset
+            if closed[neighbor]:
+                continue
+
+            if tentative_g_score >= g_score[neighbor]:
+                continue
+
+            # Este camino es el mejor hasta ahora: se inserta una nueva entrada en lugar
+            # de actualizar la existente (decrease-key perezoso)
+            came_from[neighbor] = current
+            g_score[neighbor] = tentative_g_score
+            # Meta descubierta: con costo unitario y heurística consistente, current tiene h = 1
+            # y f mínimo entre los abiertos, así que ningún otro camino puede costar menos que
+            # tentative_g_score. Se devuelve sin pasar la meta por la cola
+            if neighbor == goal_cell:
+                return came_from, tentative_g_score
+            # Heurística Manhattan en línea (sin llamada a función) con la meta ya desempaquetada
+            neighbor_y, neighbor_x = divmod(neighbor, width)
+            neighbor_index = tentative_g_score + abs(neighbor_x - goal_x) + abs(neighbor_y - goal_y) - start_h
+            while neighbor_index >= len(buckets):
+                buckets.append([])
+            buckets[neighbor_index].append(neighbor)
+
+
+def _astar_bidir_core(blocked_grid, width, height, start_cell, goal_cell):
+    """
+    Búsqueda A* bidireccional sobre celdas enteras (índice lineal y * width + x).
+
+    Avanza dos frentes a la vez, uno desde el inicio hacia la meta y otro desde la meta
+    hacia el inicio, expandiendo siempre el de menor tamaño. Cada vez que un frente mejora
+    el costo de una celda ya alcanzada por el otro, la suma de ambos costos es un camino
+    candidato; se conserva el mejor (mu) y su celda de encuentro. Como la heurística
+    Manhattan es consistente, la búsqueda termina cuando el menor f de cualquiera de los
+    dos frentes ya no puede mejorar mu. En trayectos largos cada frente cubre
+    aproximadamente la mitad de la distancia, por lo que se expanden menos nodos.
+
+    Args:
+        blocked_grid (bytearray): Rejilla de ocupación (1 = bloqueada).
+        width (int): Ancho del grid.
+        height (int): Alto del grid.
+        start_cell (int): Índice lineal del inicio.
+        goal_cell (int): Índice lineal de la meta.
+
+    Returns:
+        tuple or None: (padres hacia el inicio, padres hacia la meta, celda de encuentro,
+                       costo desde el inicio hasta el encuentro) si existe camino, None en
+                       caso contrario. Los padres son listas indexadas por celda con -1 donde
+                       no hay padre.
+    """
+    cell_offsets = _cell_offsets(width, height)
+    cell_count = width * height
+    start_y, start_x = divmod(start_cell, width)
+    goal_y, goal_x = divmod(goal_cell, width)
+    tie_breaker = count()
+
+    # Costos planos por celda; cell_count marca una celda aún no alcanzada por ese frente
+    g_score_start = [cell_count] * cell_count
+    g_score_start[start_cell] = 0
+    g_score_goal = [cell_count] * cell_count
+    g_score_goal[goal_cell] = 0
+
+    # Estado de cada frente: (heap, g_score, padres, cerrados, columna y fila de su objetivo).
+    # Como en _astar_core, los cerrados parten de una copia de la rejilla de bloqueos
+    # Entradas del heap (f, h, desempate, celda) con el mismo desempate por menor h que _astar_core
+    start_h = _cell_heuristic(start_cell, goal_x, goal_y, width)
+    forward = ([(start_h, start_h, next(tie_breaker), start_cell)],
+               g_score_start, [-1] * cell_count, bytearray(blocked_grid), goal_x, goal_y)
+    backward = ([(start_h, start_h, next(tie_breaker), goal_cell)],
+                g_score_goal, [-1] * cell_count, bytearray(blocked_grid), start_x, start_y)
+
+    best_cost = math.inf  # Costo del mejor camino completo encontrado (mu)
+    meet_cell = -1
+    if start_cell == goal_cell:
+        best_cost, meet_cell = 0, start_cell
+
+    while forward[0] and backward[0]:
+        # Ninguna entrada pendiente puede dar un camino más corto que el actual
+        if forward[0][0][0] >= best_cost or backward[0][0][0] >= best_cost:
+            break
+
+        # Expandir el frente con menos nodos abiertos
+        if len(forward[0]) <= len(backward[0]):
+            frontier, other = forward, backward
+        else:
+            frontier, other = backward, forward
+        open_heap, g_score, came_from, closed, target_x, target_y = frontier
+        other_g_score = other[1]
+
+        current = heappop(open_heap)[3]
+        if closed[current]:
+            continue
+        closed[current] = 1
+
+        tentative_g_score = g_score[current] + 1
+        for offset in cell_offsets[current]:
+            neighbor = current + offset
+            if closed[neighbor] or tentative_g_score >= g_score[neighbor]:
+                continue
+
+            came_from[neighbor] = current
+            g_score[neighbor] = tentative_g_score
+            neighbor_y, neighbor_x = divmod(neighbor, width)
+            neighbor_h = abs(neighbor_x - target_x) + abs(neighbor_y - target_y)
+            heappush(open_heap, (tentative_g_score + neighbor_h, neighbor_h, next(tie_breaker), neighbor))
+
+            # La celda ya fue alcanzada desde el otro extremo: hay un camino candidato
+            other_cost = other_g_score[neighbor]
+            if other_cost < cell_count and tentative_g_score + other_cost < best_cost:
+                best_cost = tentative_g_score + other_cost
+                meet_cell = neighbor
+
+    if meet_cell == -1:
+        # Los frentes nunca se tocaron: no hay camino
+        return None
+    return forward[2], backward[2], meet_cell, g_score_start[meet_cell]
 
 
 class AStar:
@@ -31,6 +275,7 @@ class AStar:
     # Constantes de clase para configuración de seguridad
     BLOCKED_ZONE_RADIUS = 4  # Radio de zona bloqueada alrededor de enemigos (en casillas)
     MIN_SAFE_DISTANCE = 5    # Distancia mínima segura a enemigos (en unidades)
+    PATH_CACHE_MAX_ENTRIES = 256  # Caminos memorizados por conjunto de posiciones bloqueadas
 
     def __init__(self, game_state):
         """
@@ -44,6 +289,11 @@ class AStar:
         self.game_state = game_state
         # Precalcular todas las casillas bloqueadas
         self.blocked_positions = self._calculate_blocked_positions()
+        # Rejilla de ocupación cacheada y el conjunto del que se construyó
+        self._blocked_grid = None
+        self._blocked_grid_source = None
+        # Resultados de find_path por (inicio, meta), válidos mientras no cambie la rejilla
+        self._path_cache = {}
 
     def _calculate_blocked_positions(self):
         """
@@ -53,7 +303,9 @@ class AStar:
         - Casillas adyacentes a enemigos (en las 8 direcciones)
         
         Returns:
-            set: Conjunto de todas las posiciones bloqueadas
+            frozenset: Conjunto inmutable de todas las posiciones bloqueadas. Al no poder
+                       modificarse, sirve como clave para reutilizar la rejilla de ocupación
+                       entre búsquedas.
         """
         blocked = set()
         
@@ -79,29 +331,31 @@ class AStar:
             enemy_positions = self.game_state.enemies
         
         # Agregar zonas de bloqueo alrededor de los enemigos usando distancia euclidiana
-        for enemy_pos in enemy_positions:
-            x_enemy, y_enemy = enemy_pos
-            # Bloquear posición del enemigo
-            blocked.add(enemy_pos)
-            
-            # Calcular zona de bloqueo usando distancia euclidiana precisa
-            # Usamos un rango ligeramente mayor para asegurar que capturamos todas las celdas relevantes
-            for dx in range(-self.BLOCKED_ZONE_RADIUS - 1, self.BLOCKED_ZONE_RADIUS + 2):
-                for dy in range(-self.BLOCKED_ZONE_RADIUS - 1, self.BLOCKED_ZONE_RADIUS + 2):
-                    x, y = x_enemy + dx, y_enemy + dy
-                    
-                    # Verificar límites del grid
-                    if not (0 <= x < GameConfig.GRID_WIDTH and 0 <= y < GameConfig.GRID_HEIGHT):
-                        continue
-                    
-                    # Calcular distancia euclidiana exacta
-                    distance = math.sqrt((x - x_enemy)**2 + (y - y_enemy)**2)
-                    
-                    # Bloquear si está dentro del radio (inclusive)
-                    if distance <= self.BLOCKED_ZONE_RADIUS:
-                        blocked.add((x, y))
+        if enemy_positions:
+            width, height = GameConfig.GRID_WIDTH, GameConfig.GRID_HEIGHT
+            radius = self.BLOCKED_ZONE_RADIUS
+            # Disco de radio R (inclusive) como plantilla booleana de (2R+1) x (2R+1). Se comparan
+            # distancias al cuadrado: con enteros es exacto y evita la raíz cuadrada
+            stencil_ys, stencil_xs = np.ogrid[-radius:radius + 1, -radius:radius + 1]
+            disk = stencil_xs ** 2 + stencil_ys ** 2 <= radius * radius
+            # Cada enemigo estampa el disco solo sobre su ventana de la máscara, recortada a los
+            # límites del grid, en lugar de evaluar la distancia en todas las celdas
+            zone_mask = np.zeros((height, width), dtype=bool)
+            for enemy_pos in enemy_positions:
+                x_enemy, y_enemy = enemy_pos
+                # Bloquear posición del enemigo
+                blocked.add(enemy_pos)
+                x_min, x_max = max(x_enemy - radius, 0), min(x_enemy + radius + 1, width)
+                y_min, y_max = max(y_enemy - radius, 0), min(y_enemy + radius + 1, height)
+                if x_min >= x_max or y_min >= y_max:
+                    continue
+                zone_mask[y_min:y_max, x_min:x_max] |= disk[y_min - y_enemy + radius:y_max - y_enemy + radius,
+                                                            x_min - x_enemy + radius:x_max - x_enemy + radius]
+
+            zone_ys, zone_xs = np.nonzero(zone_mask)
+            blocked.update(zip(zone_xs.tolist(), zone_ys.tolist()))
         
-        return blocked
+        return frozenset(blocked)
 
     def is_position_valid(self, pos):
         """
@@ -128,40 +382,43 @@ class AStar:
             
         return True
 
-    def _heuristic(self, pos1, pos2):
+    def _build_blocked_grid(self):
         """
-        Heurística simple de distancia Manhattan.
-        
-        Args:
-            pos1 (tuple): Primera posición (x1, y1).
-            pos2 (tuple): Segunda posición (x2, y2).
-            
+        Construye una rejilla plana de ocupación a partir de las posiciones bloqueadas.
+
+        La celda (x, y) se guarda en el índice y * GRID_WIDTH + x de un bytearray, de modo
+        que comprobar si un vecino está bloqueado es un único acceso indexado en lugar de
+        crear y hashear una tupla para buscarla en el conjunto.
+
         Returns:
-            int: Distancia Manhattan entre los dos puntos.
+            bytearray: 1 si la celda está bloqueada, 0 si es transitable.
         """
-        return abs(pos1[0] - pos2[0]) + abs(pos1[1] - pos2[1])
+        width, height = GameConfig.GRID_WIDTH, GameConfig.GRID_HEIGHT
+        blocked_grid = bytearray(width * height)
+        for x, y in self.blocked_positions:
+            if 0 <= x < width and 0 <= y < height:
+                blocked_grid[y * width + x] = 1
+        return blocked_grid
 
-    def _get_neighbors(self, pos):
+    def _get_blocked_grid(self):
         """
-        Obtiene los vecinos válidos de una posición.
-        Solo considera las cuatro direcciones cardinales.
-        
-        Args:
-            pos (tuple): Posición actual (x, y).
-            
+        Devuelve la rejilla de ocupación, reconstruyéndola solo si cambió blocked_positions.
+
+        blocked_positions puede reasignarse desde fuera entre llamadas (por ejemplo, al
+        recalcular la zona de los enemigos). Si sigue siendo el mismo frozenset con el que se
+        construyó la rejilla, su contenido no pudo cambiar y la rejilla se reutiliza; un
+        conjunto mutable nunca se da por válido y se reconstruye siempre.
+
         Returns:
-            list: Lista de posiciones válidas adyacentes.
+            bytearray: 1 si la celda está bloqueada, 0 si es transitable.
         """
-        x, y = pos
-        possible_neighbors = [
-            (x, y-1),  # Arriba
-            (x+1, y),  # Derecha
-            (x, y+1),  # Abajo
-            (x-1, y)   # Izquierda
-        ]
-        
-        # Filtrar solo las posiciones válidas (dentro de límites y no bloqueadas)
-        return [pos for pos in possible_neighbors if self.is_position_valid(pos)]
+        blocked_positions = self.blocked_positions
+        if self._blocked_grid_source is not blocked_positions or not isinstance(blocked_positions, frozenset):
+            self._blocked_grid = self._build_blocked_grid()
+            self._blocked_grid_source = blocked_positions
+            # Los caminos memorizados dependen de la rejilla anterior
+            self._path_cache.clear()
+        return self._blocked_grid
 
     def find_path(self, start, goal):
         """
@@ -169,6 +426,11 @@ class AStar:
         
         Usa el algoritmo A* pero garantiza que el camino NUNCA pasará
         por casillas con enemigos o adyacentes a enemigos.
+
+        El resultado se memoriza por (start, goal) mientras las posiciones bloqueadas
+        no cambien, de modo que las replanificaciones repetidas sobre el mismo estado no
+        repiten la búsqueda. Cada llamada devuelve una lista nueva que el llamador puede
+        modificar libremente.
         
         Args:
             start (tuple): Posición inicial (x, y).
@@ -182,61 +444,84 @@ class AStar:
         if not self.is_position_valid(start) or not self.is_position_valid(goal):
             return None
 
-        # Conjuntos para el algoritmo
-        open_set = {start}  # Nodos por explorar
-        closed_set = set()  # Nodos ya explorados
-
-        # Diccionarios para rastrear el camino
-        came_from = {}  # Para reconstruir el camino
-        g_score = {start: 0}  # Costo desde el inicio
-        f_score = {start: self._heuristic(start, goal)}  # Costo estimado total
+        # Ocupación en rejilla plana, reutilizada mientras no cambien las posiciones bloqueadas
+        # (si cambiaron, la caché de caminos se vacía al reconstruirla)
+        blocked_grid = self._get_blocked_grid()
+        # Caché en variable local y una sola búsqueda en el diccionario (False = ausente,
+        # ya que None significa "sin camino" memorizado)
+        path_cache = self._path_cache
+        cache_key = (start, goal)
+        cached_path = path_cache.get(cache_key, False)
+        if cached_path is not False:
+            return list(cached_path) if cached_path is not None else None
 
-        while open_set:
-            # Obtener el nodo con menor f_score
-            current = min(open_set, key=lambda pos: f_score.get(pos, float('inf')))
+        width = GameConfig.GRID_WIDTH
+        goal_cell = goal[1] * width + goal[0]
+        result = _astar_core(blocked_grid, width, GameConfig.GRID_HEIGHT, start[1] * width + start[0], goal_cell)
+        # No se encontró camino: también se memoriza
+        path = self._reconstruct_path(result[0], goal_cell, result[1]) if result is not None else None
 
-            # Si llegamos al objetivo, reconstruir y devolver el camino
-            if current == goal:
-                return self._reconstruct_path(came_from, current)
+        if len(path_cache) >= self.PATH_CACHE_MAX_ENTRIES:
+            path_cache.clear()
+        path_cache[cache_key] = tuple(path) if path is not None else None
+        return path
 
-            # Mover el nodo actual al conjunto cerrado
-            open_set.remove(current)
-            closed_set.add(current)
+    def find_path_bidir(self, start, goal):
+        """
+        Encuentra un camino seguro desde start hasta goal con A* bidireccional.
 
-            # Explorar vecinos válidos
-            for neighbor in self._get_neighbors(current):
-                if neighbor in closed_set:
-                    continue
+        Aplica las mismas restricciones de seguridad que find_path y devuelve un camino de
+        la misma longitud (óptima), pero busca simultáneamente desde ambos extremos. Es
+        preferible para trayectos largos en mapas con pocos obstáculos, donde la frontera
+        de una búsqueda unidireccional crece con el cuadrado de la distancia.
 
-                # Costo uniforme para todas las casillas válidas
-                tentative_g_score = g_score[current] + 1
+        Args:
+            start (tuple): Posición inicial (x, y).
+            goal (tuple): Posición objetivo (x, y).
 
-                if neighbor not in open_set:
-                    open_set.add(neighbor)
-                elif tentative_g_score >= g_score.get(neighbor, float('inf')):
-                    continue
+        Returns:
+            list or None: Lista de posiciones que forman el camino si existe,
+                          None si no hay camino seguro posible.
+        """
+        if not self.is_position_valid(start) or not self.is_position_valid(goal):
+            return None
 
-                # Este camino es el mejor hasta ahora
-                came_from[neighbor] = current
-                g_score[neighbor] = tentative_g_score
-                f_score[neighbor] = g_score[neighbor] + self._heuristic(neighbor, goal)
+        width = GameConfig.GRID_WIDTH
+        result = _astar_bidir_core(self._get_blocked_grid(), width, GameConfig.GRID_HEIGHT,
+                                   start[1] * width + start[0], goal[1] * width + goal[0])
+        if result is None:
+            return None
 
-        # No se encontró camino
-        return None
+        came_from_start, came_from_goal, meet_cell, meet_cost = result
+        # Tramo inicio -> encuentro (incluido) seguido del tramo encuentro -> meta, que los
+        # padres del frente de la meta ya recorren en el orden del camino
+        path = self._reconstruct_path(came_from_start, meet_cell, meet_cost)
+        current = came_from_goal[meet_cell]
+        while current != -1:
+            path.append((current % width, current // width))
+            current = came_from_goal[current]
+        return path
 
-    def _reconstruct_path(self, came_from, current):
+    def _reconstruct_path(self, came_from, current, path_cost):
         """
         Reconstruye el camino desde el inicio hasta el objetivo.
+
+        Con costo unitario por paso, el camino tiene exactamente path_cost + 1 posiciones:
+        la lista se reserva de una vez y se llena desde el final siguiendo los padres, sin
+        ampliarla con append ni invertirla al terminar.
         
         Args:
-            came_from (dict): Diccionario de referencias a nodos previos.
-            current (tuple): Nodo actual desde donde reconstruir.
+            came_from (list): Padre de cada celda (índice lineal, -1 si no tiene).
+            current (int): Índice lineal de la celda desde donde reconstruir.
+            path_cost (int): Costo (número de pasos) desde el inicio hasta current.
             
         Returns:
-            list: Lista de posiciones que forman el camino.
+            list: Lista de posiciones (x, y) que forman el camino.
         """
-        path = [current]
-        while current in came_from:
+        width = GameConfig.GRID_WIDTH
+        path = [None] * (path_cost + 1)
+        for index in range(path_cost, -1, -1):
+            y, x = divmod(current, width)
+            path[index] = (x, y)
             current = came_from[current]
-            path.append(current)
-        return path[::-1]  # Invertir para tener el camino desde el inicio
+        return path
@@ -1,21 +1,20 @@
 from config import GameConfig
 import numpy as np
-import random
 
 
 class DecisionTree:
     """
-    Implementación de un árbol de decisiones con poda alpha-beta para encontrar rutas óptimas.
+    Implementación de un árbol de decisiones con búsqueda IDA* para encontrar rutas óptimas.
     
     Esta clase implementa un algoritmo de búsqueda de rutas basado en árboles de decisión
-    con optimización mediante poda alpha-beta. Utiliza información del estado del juego
-    y una matriz de frecuencia de movimientos para guiar la búsqueda y priorizar rutas
-    con mayor probabilidad de éxito.
+    recorridos en profundidad con A* de profundización iterativa (IDA*). Utiliza información
+    del estado del juego y una matriz de frecuencia de movimientos para guiar la búsqueda y
+    priorizar rutas con mayor probabilidad de éxito.
     
     Características principales:
-    - Búsqueda recursiva de caminos desde un punto inicial a una meta
-    - Poda alpha-beta para reducir el espacio de búsqueda
-    - Heurística combinada que considera distancia y frecuencia de visitas
+    - Búsqueda iterativa (pila explícita, sin recursión) desde un punto inicial a una meta
+    - Umbral f = g + distancia Manhattan que se amplía en cada iteración (IDA*)
+    - Heurística combinada que considera distancia y frecuencia de visitas para ordenar vecinos
     - Límite de profundidad configurable para controlar el tiempo de búsqueda
     - Prevención de ciclos mediante seguimiento de nodos visitados
     
@@ -38,24 +37,75 @@ class DecisionTree:
         Atributos inicializados:
             max_depth: Profundidad máxima de búsqueda en el árbol (por defecto 10).
                        Limita el tiempo de búsqueda en grafos grandes.
-            visited: Conjunto de nodos visitados en la ejecución actual para evitar ciclos.
+            visited: Rejilla plana (bytearray indexado por y * GRID_WIDTH + x) que marca los
+                     nodos del camino actual para evitar ciclos. Se reutiliza entre búsquedas:
+                     cada búsqueda la deja de nuevo en ceros al terminar.
             best_path: Lista que almacena el mejor camino encontrado durante la búsqueda.
             best_score: Puntuación del mejor camino (menor es mejor, generalmente la longitud).
+            obstacle_grid: Rejilla plana de obstáculos (ver _build_obstacle_grid). None hasta
+                           la primera búsqueda: find_path la construye al empezar, con los
+                           obstáculos vigentes en ese momento.
+            visit_normalizer: Máximo de movement_matrix más uno; normaliza las visitas en
+                              la heurística. None hasta la primera búsqueda: find_path lo
+                              calcula al empezar.
+            visit_penalty: Término de visitas de la heurística (0.3 * visitas normalizadas)
+                           por celda, en una lista plana indexada por y * GRID_WIDTH + x.
+                           Como visit_normalizer, se calcula al inicio de cada búsqueda.
         """
         self.game_state = game_state
         self.movement_matrix = movement_matrix
         self.max_depth = 10  # Profundidad máxima de búsqueda
-        self.visited = set()  # Conjunto de nodos visitados en esta ejecución
+        self.visited = bytearray(GameConfig.GRID_WIDTH * GameConfig.GRID_HEIGHT)  # Nodos del camino actual
         self.best_path = None
         self.best_score = float('inf')
+        self.obstacle_grid = None  # Se construye en cada find_path
+        self.visit_normalizer = None  # Se calcula en cada find_path
+        self.visit_penalty = None  # Se construye en cada find_path
+
+    def _build_obstacle_grid(self):
+        """
+        Construye una rejilla plana de ocupación a partir de los obstáculos del juego.
+
+        La celda (x, y) se guarda en el índice y * GRID_WIDTH + x de un bytearray, de modo
+        que comprobar si un vecino es un obstáculo es un único acceso indexado en lugar de
+        crear y hashear una tupla para buscarla en el conjunto de obstáculos.
+
+        Returns:
+            bytearray: 1 si la celda tiene un obstáculo, 0 si es transitable.
+        """
+        width, height = GameConfig.GRID_WIDTH, GameConfig.GRID_HEIGHT
+        obstacle_grid = bytearray(width * height)
+        for x, y in self.game_state.obstacles:
+            if 0 <= x < width and 0 <= y < height:
+                obstacle_grid[y * width + x] = 1
+        return obstacle_grid
+
+    def _build_visit_penalty(self):
+        """
+        Calcula de una vez, con NumPy, el término de visitas de la heurística para todo el grid.
+
+        La puntuación de cada vecino pondera sus visitas normalizadas con un 30%. Ese término
+        solo depende de la celda y de movement_matrix, que no cambia durante la búsqueda, así
+        que se evalúa vectorizado sobre la matriz completa y se aplana a una lista de floats:
+        durante la búsqueda cada vecino lo obtiene con un acceso indexado, sin indexar la
+        matriz NumPy celda a celda.
+
+        Returns:
+            list: 0.3 * visitas / visit_normalizer para cada celda, indexado por
+                  y * GRID_WIDTH + x.
+        """
+        return (0.3 * (np.asarray(self.movement_matrix) / self.visit_normalizer)).ravel().tolist()
 
     def find_path(self, start, goal):
         """
         Encuentra un camino optimizado desde el punto inicial hasta la meta.
         
-        Este método público inicia el proceso de búsqueda, reiniciando las variables
-        de estado (visitados, mejor camino, mejor puntuación) y lanzando una búsqueda
-        recursiva con poda alpha-beta desde el punto inicial.
+        Este método público reinicia las variables de estado (visitados, mejor camino,
+        mejor puntuación) y ejecuta IDA*: una serie de búsquedas en profundidad acotadas
+        por un umbral f = g + h, empezando por la distancia Manhattan del inicio a la meta.
+        Si una pasada no alcanza la meta, el umbral sube al menor f que la superó y se
+        repite. Como la distancia Manhattan nunca sobreestima, el primer camino encontrado
+        es el más corto, con la memoria de una búsqueda en profundidad.
         
         Args:
             start (tuple): Coordenadas (x, y) del punto inicial.
@@ -68,17 +118,25 @@ class DecisionTree:
         
         Nota:
             Los resultados de la búsqueda dependen significativamente del valor de max_depth.
-            Valores mayores pueden encontrar caminos más óptimos pero a costa de mayor
-            tiempo de procesamiento.
+            El umbral nunca supera max_depth: las metas a más de max_depth pasos se
+            consideran inalcanzables.
         """
         print(f"\nIniciando búsqueda de ruta desde {start} hasta {goal}")
-        self.visited = set()
         self.best_path = None
         self.best_score = float('inf')
+        # Los obstáculos y la matriz de movimiento pueden haber cambiado desde la última
+        # búsqueda, pero no cambian durante ella: el máximo se calcula una sola vez aquí en
+        # lugar de recorrer la matriz entera por cada vecino evaluado
+        self.obstacle_grid = self._build_obstacle_grid()
+        self.visit_normalizer = float(np.max(self.movement_matrix)) + 1.0
+        self.visit_penalty = self._build_visit_penalty()
 
-        # Iniciar búsqueda recursiva
-        path = [start]
-        self._search_path(start, goal, path, 0, float('-inf'), float('inf'))
+        # Profundización iterativa: cada pasada devuelve el siguiente umbral a probar
+        threshold = self._heuristic(start, goal)
+        while threshold <= self.max_depth:
+            threshold = self._search_path(start, goal, threshold)
+            if self.best_path:
+                break
 
         if self.best_path:
             print(f"Ruta encontrada: {self.best_path}")
@@ -88,89 +146,85 @@ class DecisionTree:
 
         return self.best_path if self.best_path else [start]
 
-    def _search_path(self, current, goal, path, depth, alpha, beta):
+    def _search_path(self, start, goal, threshold):
         """
-        Implementa la búsqueda recursiva del camino utilizando poda alpha-beta.
+        Ejecuta una pasada de IDA*: búsqueda en profundidad acotada por el umbral f.
         
-        Este método privado realiza la búsqueda recursiva a través del espacio de estados,
-        explorando los posibles movimientos desde la posición actual y utilizando
-        la poda alpha-beta para reducir la exploración de ramas que no pueden mejorar
-        la mejor solución encontrada hasta el momento.
+        La búsqueda es iterativa. Cada nivel del camino actual guarda en una pila explícita
+        el iterador de sus vecinos pendientes, de modo que avanzar o retroceder es mover un
+        elemento de la pila sin crear marcos de llamada de Python.
         
-        La búsqueda se realiza en profundidad (DFS) pero con las siguientes optimizaciones:
-        - Límite de profundidad máxima para evitar búsquedas infinitas
-        - Poda alpha-beta para eliminar ramas subóptimas
+        Optimizaciones:
+        - Poda de los vecinos cuyo f = g + h supera el umbral (nunca pueden llevar a la
+          meta dentro de esta pasada)
         - Heurística para priorizar vecinos más prometedores
-        - Detección de ciclos mediante seguimiento de nodos visitados
-        - Límite basado en la mejor solución encontrada hasta el momento
+        - Detección de ciclos mediante seguimiento de nodos visitados en el camino actual
         
         Args:
-            current (tuple): Posición actual (x, y) en la búsqueda.
+            start (tuple): Posición inicial (x, y) de la búsqueda.
             goal (tuple): Posición objetivo (x, y) a alcanzar.
-            path (list): Camino acumulado hasta el momento.
-            depth (int): Profundidad actual en el árbol de búsqueda.
-            alpha (float): Valor alpha para la poda (mejor valor para el maximizador).
-            beta (float): Valor beta para la poda (mejor valor para el minimizador).
+            threshold (int): Máximo f = g + h admitido en esta pasada.
             
         Returns:
-            float: Puntuación del mejor camino encontrado desde la posición actual.
-                  float('inf') significa que no se encontró un camino válido.
+            float: Menor f que superó el umbral, a usar como umbral de la siguiente pasada.
+                  float('inf') si no quedan ramas por ampliar o si se alcanzó la meta.
         
         Efectos secundarios:
-            Actualiza self.best_path y self.best_score si encuentra un camino mejor.
+            Actualiza self.best_path y self.best_score si alcanza la meta.
         """
-        # Caso base: llegamos a la meta
-        if current == goal:
-            path_score = len(path)
-            if path_score < self.best_score:
-                self.best_path = path.copy()
-                self.best_score = path_score
-            return path_score
-
-        # Caso base: profundidad máxima alcanzada o camino demasiado largo
-        if depth >= self.max_depth or len(path) > self.best_score:
+        # Caso trivial: ya estamos en la meta
+        if start == goal:
+            self.best_path = [start]
+            self.best_score = 1
             return float('inf')
 
-        # Marcar como visitado en esta ejecución
-        self.visited.add(current)
-
-        # Obtener vecinos ordenados por prioridad
-        neighbors = self._get_prioritized_neighbors(current, goal)
-
-        # Valor mínimo para el nodo actual
-        min_score = float('inf')
-        best_local_path = None
+        goal_x, goal_y = goal
+        next_threshold = float('inf')
+        width = GameConfig.GRID_WIDTH
+        visited = self.visited
+        path = [start]
+        visited[start[1] * width + start[0]] = 1
+        stack = [iter(self._get_prioritized_neighbors(start, goal))]
 
-        for neighbor in neighbors:
-            # Evitar ciclos y nodos ya visitados
-            if neighbor in self.visited or neighbor in path:
+        while stack:
+            neighbor = next(stack[-1], None)
+            if neighbor is None:
+                # Vecinos agotados: retroceder un nivel y desmarcar el nodo (backtracking)
+                stack.pop()
+                x, y = path.pop()
+                visited[y * width + x] = 0
                 continue
 
-            # Explorar este vecino
-            path.append(neighbor)
-            score = self._search_path(neighbor, goal, path, depth + 1, alpha, beta)
-            path.pop()  # Backtracking
-
-            # Actualizar mejor puntuación local
-            if score < min_score:
-                min_score = score
-                best_local_path = path.copy()
+            # Evitar ciclos: cada nodo del camino actual está marcado en visited (un acceso
+            # indexado, sin hashear la tupla)
+            neighbor_x, neighbor_y = neighbor
+            neighbor_cell = neighbor_y * width + neighbor_x
+            if visited[neighbor_cell]:
+                continue
 
-            # Poda beta
-            beta = min(beta, min_score)
-            if alpha >= beta:
-                break  # Poda alpha-beta
+            # g del vecino es la longitud del camino actual; poda por umbral f = g + h
+            f_score = len(path) + abs(neighbor_x - goal_x) + abs(neighbor_y - goal_y)
+            if f_score > threshold:
+                if f_score < next_threshold:
+                    next_threshold = f_score
+                continue
 
-        # Desmarcar como visitado (backtracking)
-        self.visited.remove(current)
+            if neighbor == goal:
+                path.append(neighbor)
+                self.best_path = path
+                self.best_score = len(path)
+                # Dejar visited en ceros para la siguiente búsqueda: solo están marcadas
+                # las celdas del camino, no hace falta limpiar la rejilla entera
+                for x, y in path:
+                    visited[y * width + x] = 0
+                return float('inf')
 
-        # Si encontramos un camino válido, actualizar el mejor camino global
-        if best_local_path and min_score < float('inf'):
-            if len(best_local_path) < self.best_score:
-                self.best_path = best_local_path
-                self.best_score = len(best_local_path)
+            # Avanzar un nivel
+            path.append(neighbor)
+            visited[neighbor_cell] = 1
+            stack.append(iter(self._get_prioritized_neighbors(neighbor, goal)))
 
-        return min_score
+        return next_threshold
 
     def _get_prioritized_neighbors(self, pos, goal):
         """
@@ -182,7 +236,7 @@ class DecisionTree:
         2. La frecuencia de visitas previas normalizadas (30% del peso)
         
         El proceso consta de tres etapas:
-        1. Generación de posibles vecinos basada en los rangos de movimiento configurados
+        1. Generación de los cuatro vecinos ortogonales
         2. Filtrado de vecinos inválidos (fuera de límites o con obstáculos)
         3. Ordenamiento de vecinos según la puntuación heurística combinada
         
@@ -195,55 +249,43 @@ class DecisionTree:
                   por prioridad (el más prometedor primero).
         
         Nota:
-            La aleatoriedad en la generación de vecinos introduce variabilidad en los
-            resultados, lo que puede ayudar a evitar mínimos locales pero también
-            puede llevar a soluciones diferentes en cada ejecución.
+            Se generan siempre las cuatro direcciones. Elegir una sola al azar (con los
+            rangos de movimiento del juego) dejaba a lo sumo un hijo por nodo: la búsqueda
+            se reducía a una caminata aleatoria, el orden heurístico no tenía nada que
+            ordenar y la poda por longitud casi nunca actuaba.
         """
         x, y = pos
-        move_value = random.randint(1, 20)  # Usar el mismo rango que en el juego
-        possible_neighbors = []
-
-        # Usar los rangos de movimiento de config
-        if GameConfig.MOVE_UP_RANGE[0] <= move_value <= GameConfig.MOVE_UP_RANGE[1]:
-            possible_neighbors.append((x, y - 1))  # Arriba
-        elif GameConfig.MOVE_RIGHT_RANGE[0] <= move_value <= GameConfig.MOVE_RIGHT_RANGE[1]:
-            possible_neighbors.append((x + 1, y))  # Derecha
-        elif GameConfig.MOVE_DOWN_RANGE[0] <= move_value <= GameConfig.MOVE_DOWN_RANGE[1]:
-            possible_neighbors.append((x, y + 1))  # Abajo
-        elif GameConfig.MOVE_LEFT_RANGE[0] <= move_value <= GameConfig.MOVE_LEFT_RANGE[1]:
-            possible_neighbors.append((x - 1, y))  # Izquierda
+        # Arriba, Derecha, Abajo, Izquierda
+        possible_neighbors = ((x, y - 1), (x + 1, y), (x, y + 1), (x - 1, y))
 
-        # Filtrar vecinos válidos
-        valid_neighbors = []
+        # Filtrar vecinos válidos y puntuarlos en una sola pasada
+        width = GameConfig.GRID_WIDTH
+        distance_scale = GameConfig.GRID_WIDTH + GameConfig.GRID_HEIGHT
+        obstacle_grid = self.obstacle_grid
+        visit_penalty = self.visit_penalty
+        goal_x, goal_y = goal
+        neighbor_scores = []
         for nx, ny in possible_neighbors:
             # Verificar límites del grid
-            if (0 <= nx < GameConfig.GRID_WIDTH and
-                    0 <= ny < GameConfig.GRID_HEIGHT):
-                # Verificar que no sea un obstáculo
-                if (nx, ny) not in self.game_state.obstacles:
-                    valid_neighbors.append((nx, ny))
-
-        # Calcular puntuación para cada vecino
-        neighbor_scores = []
-        for neighbor in valid_neighbors:
-            nx, ny = neighbor
-            # Obtener frecuencia de visitas (normalizada)
-            visit_count = self.movement_matrix[ny][nx]
-            visit_score = visit_count / (np.max(self.movement_matrix) + 1)
+            if not (0 <= nx < width and 0 <= ny < GameConfig.GRID_HEIGHT):
+                continue
+            cell = ny * width + nx
+            # Verificar que no sea un obstáculo (consulta en la rejilla, sin hashear la tupla)
+            if obstacle_grid[cell]:
+                continue
 
-            # Calcular distancia a la meta
-            distance = self._heuristic(neighbor, goal)
-            distance_score = distance / (GameConfig.GRID_WIDTH + GameConfig.GRID_HEIGHT)
+            # Distancia Manhattan a la meta, normalizada
+            distance_score = (abs(nx - goal_x) + abs(ny - goal_y)) / distance_scale
 
-            # Puntuación combinada (menor es mejor)
-            combined_score = (0.7 * distance_score) + (0.3 * visit_score)
-            neighbor_scores.append((neighbor, combined_score))
+            # Puntuación combinada (menor es mejor); el término de visitas ya está ponderado
+            combined_score = (0.7 * distance_score) + visit_penalty[cell]
+            neighbor_scores.append((combined_score, (nx, ny)))
 
-        # Ordenar por puntuación (menor primero)
-        neighbor_scores.sort(key=lambda x: x[1])
+        # Ordenar por puntuación (menor primero); sort es estable, los empates conservan el orden
+        neighbor_scores.sort(key=lambda x: x[0])
 
         # Devolver solo los vecinos ordenados
-        return [n[0] for n in neighbor_scores]
+        return [n[1] for n in neighbor_scores]
 
     def _heuristic(self, pos1, pos2):
         """
@@ -11,6 +11,16 @@ from render import GameRenderer
 from ADB import QLearningAgent
 from HeatMapPathfinding import HeatMapPathfinding
 
+# Límite de pasos al simular la política Q aprendida sobre la cuadrícula
+_POLICY_SIM_MAX_STEPS = GameConfig.GRID_WIDTH * GameConfig.GRID_HEIGHT * 2
+
+
+def _training_progress_pct(iteration, total_iterations):
+    # Sin iteraciones configuradas no hay nada pendiente: el entrenamiento cuenta como completo
+    if total_iterations <= 0:
+        return 100.0
+    return (iteration / total_iterations) * 100.0
+
 
 class Game:
     """
@@ -60,6 +70,8 @@ class Game:
         self._train_avatar_heatmap_on_init()
 
         self.player_movement_frequency_matrix = np.zeros((GameConfig.GRID_HEIGHT, GameConfig.GRID_WIDTH), dtype=int)
+        # Máximo de visitas mantenido al incrementar: el render no recorre la matriz cada frame
+        self.player_movement_frequency_max = 0
 
         self.move_timer = pygame.time.get_ticks()
         self.edit_mode = None
@@ -72,14 +84,13 @@ class Game:
         self.input_buffer = ""
 
         self.determine_player_optimal_path()  # Calcular ruta inicial basada en el estado inicial
-        self.current_path_player = self.best_path_player.copy() if self.best_path_player else [
-            self.game_state.player_pos]
+        self.current_path_player = self._path_from_best()
         self.path_index_player = 0
 
     def _train_avatar_heatmap_on_init(self):
         print("\n=== ENTRENANDO/RE-ENTRENANDO HEATMAP DEL AVATAR ===")
         iters_hm = self.avatar_heatmap_training_iterations
-        enemy_positions_set_for_hm = set(self.game_state.enemy_positions)  # Usar enemigos actuales
+        enemy_positions_set_for_hm = self.game_state.enemy_positions  # Usar enemigos actuales (train solo los lee)
 
         best_hm_path = self.heat_map_pathfinder.train(
             self.game_state.initial_player_pos, self.game_state.house_pos,
@@ -123,7 +134,7 @@ class Game:
                     next_pos = self.best_path_player[self.path_index_player]
                     if self.game_state.is_valid_move(next_pos) and next_pos not in self.game_state.enemy_positions:
                         self.game_state.player_pos = next_pos
-                        self.player_movement_frequency_matrix[next_pos[1]][next_pos[0]] += 1
+                        self._record_player_visit(next_pos)
                         if next_pos == self.game_state.house_pos:  # Chequeo de victoria
                             self.game_state.victory = True;
                             self.is_running = False;
@@ -156,7 +167,7 @@ class Game:
                     if self.game_state.is_valid_move(
                             next_p_norm) and next_p_norm not in self.game_state.enemy_positions:
                         self.game_state.player_pos = next_p_norm
-                        self.player_movement_frequency_matrix[next_p_norm[1]][next_p_norm[0]] += 1
+                        self._record_player_visit(next_p_norm)
                         self.path_index_player += 1
                         self.step_counter += 1
                         moved_this_frame = True
@@ -173,34 +184,12 @@ class Game:
                 self.is_running = False;
                 print("¡Meta alcanzada!")
 
-    def _execute_player_random_move(self):
-        val_rand = random.randint(1, 20);
-        curr_p = self.game_state.player_pos;
-        next_p_cand = None
-        if GameConfig.MOVE_UP_RANGE[0] <= val_rand <= GameConfig.MOVE_UP_RANGE[1]:
-            next_p_cand = (curr_p[0], curr_p[1] - 1)
-        elif GameConfig.MOVE_RIGHT_RANGE[0] <= val_rand <= GameConfig.MOVE_RIGHT_RANGE[1]:
-            next_p_cand = (curr_p[0] + 1, curr_p[1])
-        elif GameConfig.MOVE_DOWN_RANGE[0] <= val_rand <= GameConfig.MOVE_DOWN_RANGE[1]:
-            next_p_cand = (curr_p[0], curr_p[1] + 1)
-        elif GameConfig.MOVE_LEFT_RANGE[0] <= val_rand <= GameConfig.MOVE_LEFT_RANGE[1]:
-            next_p_cand = (curr_p[0] - 1, curr_p[1])
-
-        if next_p_cand and self.game_state.is_valid_move(
-                next_p_cand) and next_p_cand not in self.game_state.enemy_positions:
-            self.game_state.player_pos = next_p_cand
-            self.player_movement_frequency_matrix[next_p_cand[1]][next_p_cand[0]] += 1
-            self.step_counter += 1
-            self.current_path_player = [self.game_state.player_pos]
-            self.path_index_player = 0
-            self.player_uses_heatmap_path = False
-
     def initiate_player_agent_training(self):
         if self.player_agent_is_training: print("Ent. Jugador ya en curso."); return
         if self.enemy_agent_is_training: print("Ent. Enemigo en curso, espera."); return
         print("Iniciando ent. AGENTE JUGADOR...");
         self.game_state.player_pos = self.game_state.initial_player_pos
-        self.player_movement_frequency_matrix.fill(0)
+        self._reset_player_movement_frequency()
         self.game_state.victory = False;
         self.player_agent_is_training = True;
         self.player_agent_training_progress = 0.0
@@ -210,8 +199,7 @@ class Game:
         self.agent_player.max_training_iterations = self.player_agent_max_training_iterations
 
         def p_q_cb(it, _p, _h, _bp, is_final=False):
-            self.player_agent_training_progress = (
-                                                          it / self.agent_player.max_training_iterations) * 100.0 if self.agent_player.max_training_iterations > 0 else 100.0
+            self.player_agent_training_progress = _training_progress_pct(it, self.agent_player.max_training_iterations)
             p_rew = getattr(self.agent_player, 'best_reward', -float('inf'))
             self.player_agent_training_status = f"J:Recomp {p_rew:.1f}" if p_rew > -float('inf') else "J:Opt..."
             if is_final:
@@ -222,7 +210,7 @@ class Game:
 
                 path_s = [self.game_state.initial_player_pos];
                 c_s = path_s[0]
-                for _ in range(GameConfig.GRID_WIDTH * GameConfig.GRID_HEIGHT * 2):
+                for _ in range(_POLICY_SIM_MAX_STEPS):
                     if c_s == self.game_state.house_pos: break
                     act_s = self.agent_player.get_learned_action_xy(c_s, obs_p_train,
                                                                     target_pos=self.game_state.house_pos)
@@ -263,8 +251,8 @@ class Game:
         if self.player_agent_training_complete and hasattr(self.agent_player, 'get_learned_action_xy'):
             q_p_s = [self.game_state.player_pos];
             c_qp_s = q_p_s[0];
-            obs_qp_s = set(self.game_state.obstacles)
-            for _ in range(GameConfig.GRID_WIDTH * GameConfig.GRID_HEIGHT * 2):
+            obs_qp_s = self.game_state.obstacles
+            for _ in range(_POLICY_SIM_MAX_STEPS):
                 if c_qp_s == self.game_state.house_pos: break
                 act_qp_s = self.agent_player.get_learned_action_xy(c_qp_s, obs_qp_s,
                                                                    target_pos=self.game_state.house_pos)
@@ -282,8 +270,7 @@ class Game:
         else:
             self.best_path_player = None
 
-        self.current_path_player = self.best_path_player.copy() if self.best_path_player else [
-            self.game_state.player_pos]
+        self.current_path_player = self._path_from_best()
         self.path_index_player = 0
         if self.current_path_player and self.current_path_player[0] != self.game_state.player_pos:
             self.current_path_player = [self.game_state.player_pos]
@@ -317,7 +304,7 @@ class Game:
     def reset_game_state_full(self):
         self.is_running = False
         self.game_state.initialize_game();
-        self.player_movement_frequency_matrix.fill(0)
+        self._reset_player_movement_frequency()
         self.best_path_player = None
         self.step_counter = 0;
         self.game_over = False;
@@ -336,8 +323,7 @@ class Game:
         print("Juego reseteado. Aprendizaje agentes MANTENIDO.")
         self._train_avatar_heatmap_on_init()
         self.determine_player_optimal_path()
-        self.current_path_player = self.best_path_player.copy() if self.best_path_player else [
-            self.game_state.player_pos]
+        self.current_path_player = self._path_from_best()
         self.path_index_player = 0
 
     def generate_new_random_obstacles(self):
@@ -346,8 +332,7 @@ class Game:
         self.best_path_player = None
         self._train_avatar_heatmap_on_init()
         self.determine_player_optimal_path()
-        self.current_path_player = self.best_path_player.copy() if self.best_path_player else [
-            self.game_state.player_pos]
+        self.current_path_player = self._path_from_best()
         self.path_index_player = 0
 
     def clear_all_enemies(self):
@@ -366,12 +351,14 @@ class Game:
 
         if pos_edit_obs in self.game_state.obstacles:
             self.game_state.obstacles.remove(pos_edit_obs);
+            self.game_state.mark_obstacles_changed()
             print(f"Obstáculo quitado: {pos_edit_obs}")
             changed = True
         else:
             if pos_edit_obs in self.game_state.enemy_positions: print(
                 f"No se puede añadir obstáculo en posición de enemigo: {pos_edit_obs}"); return
             self.game_state.obstacles.add(pos_edit_obs);
+            self.game_state.mark_obstacles_changed()
             print(f"Obstáculo añadido: {pos_edit_obs}")
             changed = True
 
@@ -379,8 +366,7 @@ class Game:
             self.best_path_player = None
             self._train_avatar_heatmap_on_init()
             self.determine_player_optimal_path()
-            self.current_path_player = self.best_path_player.copy() if self.best_path_player else [
-                self.game_state.player_pos]
+            self.current_path_player = self._path_from_best()
             self.path_index_player = 0
 
     def reset_avatar_heatmap_data(self):
@@ -406,15 +392,13 @@ class Game:
         stop_flag_hm_train = [False]
 
         def hm_cb_inter(it_n, tot_n, _p, _bp, prog_p, is_final=False):
-            if it_n % (tot_n // 20 if tot_n >= 20 else 1) == 0:
-                pass
             pygame.event.pump()
             for ev_stop in pygame.event.get():
                 if ev_stop.type == pygame.QUIT: stop_flag_hm_train[0] = True; self.is_pygame_loop_running = False
                 if ev_stop.type == pygame.KEYDOWN and ev_stop.key == pygame.K_ESCAPE: stop_flag_hm_train[0] = True
             return not stop_flag_hm_train[0]
 
-        current_enemies_for_hm_train = set(self.game_state.enemy_positions)
+        current_enemies_for_hm_train = self.game_state.enemy_positions
         best_hm_p_i = self.heat_map_pathfinder.train(
             start_pos_hm, target_pos_hm,
             self.game_state.obstacles, current_enemies_for_hm_train, iters, callback=hm_cb_inter)
@@ -551,7 +535,7 @@ class Game:
             self.game_state.player_pos = new_player_pos
 
             if GameConfig.COUNT_SETUP_MOVES_IN_FREQUENCY_MAP:
-                self.player_movement_frequency_matrix[new_player_pos[1]][new_player_pos[0]] += 1
+                self._record_player_visit(new_player_pos)
 
             self.determine_player_optimal_path()  # Actualizar rutas planeadas después de mover en config
 
@@ -702,8 +686,7 @@ class Game:
             self.best_path_player = None
             self._train_avatar_heatmap_on_init()
             self.determine_player_optimal_path()
-            self.current_path_player = self.best_path_player.copy() if self.best_path_player else [
-                self.game_state.player_pos]
+            self.current_path_player = self._path_from_best()
             self.path_index_player = 0
 
     def _process_ui_button_click(self, button_id_str_clicked):
@@ -762,11 +745,11 @@ class Game:
             self.toggle_player_edit_mode("enemies")
         elif button_id_str_clicked == "clear_obstacles":
             self.game_state.obstacles.clear();
+            self.game_state.mark_obstacles_changed()
             self.best_path_player = None;
             self._train_avatar_heatmap_on_init()
             self.determine_player_optimal_path()
-            self.current_path_player = self.best_path_player.copy() if self.best_path_player else [
-                self.game_state.player_pos]
+            self.current_path_player = self._path_from_best()
             self.path_index_player = 0
             print("Obstáculos borrados.")
         elif button_id_str_clicked == "clear_enemies":
@@ -879,9 +862,6 @@ class Game:
         if not self.player_agent_training_complete:
             self.player_agent_training_status = "Jugador - DETENIDO"
 
-    def player_agent_training_callback(self, iteration, _p_ign, _h_ign, _bp_pol_ign, is_final=False):
-        pass
-
     def initiate_enemy_q_agent_training(self):
         if self.enemy_agent_is_training: print("El Q-Agent Enemigo ya está entrenando."); return
         if self.player_agent_is_training: print("El Agente Jugador está entrenando, espera."); return
@@ -922,10 +902,8 @@ class Game:
         return (1, 1)
 
     def _enemy_q_agent_training_callback(self, iteration, _pe_ign, _he_ign, _bpe_pol_ign, is_final=False):
-        if hasattr(self.enemy_q_agent, 'max_training_iterations') and self.enemy_q_agent.max_training_iterations > 0:
-            self.enemy_agent_training_progress = (iteration / self.enemy_q_agent.max_training_iterations) * 100.0
-        else:
-            self.enemy_agent_training_progress = 100.0 if iteration > 0 else 0.0
+        self.enemy_agent_training_progress = _training_progress_pct(iteration,
+                                                                    self.enemy_q_agent.max_training_iterations)
         e_q_b_rew = getattr(self.enemy_q_agent, 'best_reward', -float('inf'))
         if e_q_b_rew > -float('inf'):
             self.enemy_agent_training_status = f"Enemigo - Recomp: {e_q_b_rew:.1f}"
@@ -1004,6 +982,20 @@ class Game:
             return True
         return False
 
+    def _record_player_visit(self, pos):
+        visits = int(self.player_movement_frequency_matrix[pos[1], pos[0]]) + 1
+        self.player_movement_frequency_matrix[pos[1], pos[0]] = visits
+        if visits > self.player_movement_frequency_max:
+            self.player_movement_frequency_max = visits
+
+    def _reset_player_movement_frequency(self):
+        self.player_movement_frequency_matrix.fill(0)
+        self.player_movement_frequency_max = 0
+
+    def _path_from_best(self):
+        # Las rutas solo se reasignan, nunca se modifican in situ: se comparte la lista sin copiarla
+        return self.best_path_player if self.best_path_player else [self.game_state.player_pos]
+
     def _is_pos_in_grid(self, pos_tuple_check):
         x_c, y_c = pos_tuple_check
         return 0 <= x_c < self.game_state.grid_width and 0 <= y_c < self.game_state.grid_height
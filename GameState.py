@@ -11,6 +11,8 @@ class GameState:
         self.grid_width = grid_width
         self.grid_height = grid_height
         self.obstacles = set()
+        # Se incrementa cada vez que cambia el conjunto de obstáculos (ver mark_obstacles_changed)
+        self.obstacles_version = 0
         self.enemies = {}  # {enemy_id: {'position': (x,y), 'type': '...', ...}}
         self.enemy_positions = set()  # Para chequeos rápidos de colisión
         self.next_enemy_id = 1
@@ -89,6 +91,11 @@ class GameState:
         if attempts >= max_attempts and len(self.obstacles) < num_obstacles:
             print(
                 f"Advertencia GS: No se pudieron generar todos los obstáculos. Generados: {len(self.obstacles)} de {num_obstacles}")
+        self.mark_obstacles_changed()
+
+    def mark_obstacles_changed(self):
+        """Avisa que obstacles cambió, para que las cachés que dependen de él se regeneren."""
+        self.obstacles_version += 1
 
     def is_valid_move(self, pos):
         """Verifica si una posición es válida para mover al jugador."""
@@ -2,8 +2,31 @@
 import numpy as np
 import heapq
 import random
-import matplotlib.pyplot as plt
-from matplotlib.colors import LinearSegmentedColormap
+from collections import deque
+from functools import lru_cache
+
+# Tamaño del bloque de números aleatorios que train pide a NumPy de una sola vez
+_RANDOM_CHUNK = 4096
+
+
+# Desplazamientos de vecino dentro del grid para cada celda x * height + y, calculados una vez
+# por tamaño: la búsqueda no compara límites por vecino
+@lru_cache(maxsize=None)
+def _neighbor_offsets(width, height):
+    offsets = []
+    for x in range(width):
+        for y in range(height):
+            cell_offsets = []
+            if y < height - 1:
+                cell_offsets.append(1)
+            if y > 0:
+                cell_offsets.append(-1)
+            if x < width - 1:
+                cell_offsets.append(height)
+            if x > 0:
+                cell_offsets.append(-height)
+            offsets.append(tuple(cell_offsets))
+    return tuple(offsets)
 
 
 class HeatMapPathfinding:
@@ -18,6 +41,12 @@ class HeatMapPathfinding:
         self.safe_zones = []
         self.last_analysis_params = None
 
+        # Buffers de find_path_with_heat_map reutilizados entre llamadas; solo se limpian
+        # las celdas que tocó la búsqueda anterior
+        self._search_came_from = [-1] * (width * height)
+        self._search_cost = [float('inf')] * (width * height)
+        self._search_touched = []
+
     def reset(self):
         self.avatar_heat_map.fill(0)
         self.enemy_heat_map.fill(0)
@@ -36,19 +65,50 @@ class HeatMapPathfinding:
             (pos not in obstacles_set or (target_goal is not None and pos == target_goal))
 
     def _get_neighbors(self, pos, obstacles_set, target_goal=None):
+        # Método caliente (train/find_path): atributos en locales y _is_valid en línea
         x, y = pos
+        width, height = self.width, self.height
         neighbors = []
-        for dx, dy in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+        for dx, dy in ((0, 1), (0, -1), (1, 0), (-1, 0)):
             nx, ny = x + dx, y + dy
-            if self._is_valid((nx, ny), obstacles_set, target_goal):
-                neighbors.append((nx, ny))
+            if 0 <= nx < width and 0 <= ny < height:
+                n_pos = (nx, ny)
+                if n_pos not in obstacles_set or (target_goal is not None and n_pos == target_goal):
+                    neighbors.append(n_pos)
         return neighbors
 
+    def _enemy_penalty_grid(self, enemy_positions_set):
+        # Penalización por cercanía a enemigos de cada celda (lista plana, índice y*W+x): los
+        # enemigos no se mueven durante train, así que se calcula una vez y no por vecino
+        ys, xs = np.indices((self.height, self.width))
+        penalty = np.zeros((self.height, self.width))
+        for enemy_x, enemy_y in enemy_positions_set:
+            dist_to_enemy = np.abs(xs - enemy_x) + np.abs(ys - enemy_y)
+            penalty += np.where(dist_to_enemy < 1, 2000.0,
+                                np.where(dist_to_enemy < 3, 600 / (dist_to_enemy + 0.1), 0.0))
+        return penalty.ravel().tolist()
+
     def train(self, start_pos, goal_pos, obstacles, enemy_positions_set, iterations=1000, callback=None):
         self.avatar_heat_map.fill(0)
         obstacles_set = set(obstacles) if not isinstance(obstacles, set) else obstacles
         best_path_found = None
 
+        # Inicio y meta no cambian entre iteraciones: el límite de pasos es invariante
+        max_steps = (self.width * self.height) // 2 + self.manhattan_distance(start_pos, goal_pos) * 2
+        max_steps = max(max_steps, 20)
+
+        # Sorteos por lotes: una llamada vectorizada reemplaza un random.uniform por vecino,
+        # el umbral de exploración y las elecciones de vecino; cada paso consume como mucho 7 valores
+        draws = np.random.random(_RANDOM_CHUNK).tolist()
+        draw_idx = 0
+
+        width = self.width
+        cell_count = width * self.height
+        start_cell = start_pos[1] * width + start_pos[0]
+        goal_x, goal_y = goal_pos
+        heat_map = self.avatar_heat_map
+        enemy_penalty = self._enemy_penalty_grid(enemy_positions_set)
+
         for i in range(iterations):
             if callback and not callback(i, iterations, None, best_path_found, (i / iterations) * 100.0,
                                          is_final=False):
@@ -56,8 +116,11 @@ class HeatMapPathfinding:
 
             current_pos = start_pos
             path_taken = [current_pos]
-            max_steps = (self.width * self.height) // 2 + self.manhattan_distance(start_pos, goal_pos) * 2
-            max_steps = max(max_steps, 20)
+            # Casillas del recorrido como banderas por celda (índice y*W+x, sin hashear tuplas) y
+            # ventana fija de las 3 últimas posiciones (sin rebanar la lista)
+            visited_in_walk = bytearray(cell_count)
+            visited_in_walk[start_cell] = 1
+            recent_positions = deque(path_taken, maxlen=3)
 
             for step_num in range(max_steps):
                 if current_pos == goal_pos:
@@ -67,45 +130,59 @@ class HeatMapPathfinding:
                 if not neighbors:
                     break
 
-                weighted_neighbors = []
-                for neighbor_pos in neighbors:
-                    weight = self.manhattan_distance(neighbor_pos, goal_pos) * -10.0
-                    for enemy_pos in enemy_positions_set:
-                        dist_to_enemy = self.manhattan_distance(neighbor_pos, enemy_pos)
-                        if dist_to_enemy < 1:
-                            weight -= 2000
-                        elif dist_to_enemy < 3:
-                            weight -= 600 / (dist_to_enemy + 0.1)
-
-                    weight += self.avatar_heat_map[neighbor_pos[1], neighbor_pos[0]] * 0.05
-                    weighted_neighbors.append((weight + random.uniform(-0.1, 0.1), neighbor_pos))
+                if draw_idx > _RANDOM_CHUNK - 7:
+                    draws = np.random.random(_RANDOM_CHUNK).tolist()
+                    draw_idx = 0
 
-                if not weighted_neighbors: break
-
-                if random.random() < 0.15 and len(weighted_neighbors) > 1:
-                    current_pos = random.choice(neighbors)
+                # Un solo recorrido de los vecinos: el mejor se sigue en escalares, sin lista
+                # intermedia de (peso, vecino) ni una segunda pasada con max
+                best_weight = None
+                best_neighbor = None
+                for neighbor_pos in neighbors:
+                    weight = (abs(neighbor_pos[0] - goal_x) + abs(neighbor_pos[1] - goal_y)) * -10.0
+                    weight -= enemy_penalty[neighbor_pos[1] * width + neighbor_pos[0]]
+                    weight += heat_map[neighbor_pos[1], neighbor_pos[0]] * 0.05
+                    weight += (draws[draw_idx] - 0.5) * 0.2
+                    draw_idx += 1
+                    if best_weight is None or weight > best_weight:
+                        best_weight = weight
+                        best_neighbor = neighbor_pos
+
+                explore = draws[draw_idx] < 0.15
+                draw_idx += 1
+                if explore and len(neighbors) > 1:
+                    current_pos = neighbors[int(draws[draw_idx] * len(neighbors))]
+                    draw_idx += 1
                 else:
-                    weighted_neighbors.sort(key=lambda x: x[0], reverse=True)
-                    current_pos = weighted_neighbors[0][1]
+                    current_pos = best_neighbor
 
-                if current_pos in path_taken and len(path_taken) > 5:
-                    valid_random_choices = [n for n in neighbors if n not in path_taken[-3:]]
+                if visited_in_walk[current_pos[1] * width + current_pos[0]] and len(path_taken) > 5:
+                    valid_random_choices = [n for n in neighbors if n not in recent_positions]
                     if valid_random_choices:
-                        current_pos = random.choice(valid_random_choices)
+                        current_pos = valid_random_choices[int(draws[draw_idx] * len(valid_random_choices))]
+                        draw_idx += 1
                     elif neighbors:
-                        current_pos = random.choice(neighbors)
+                        current_pos = neighbors[int(draws[draw_idx] * len(neighbors))]
+                        draw_idx += 1
                     else:
                         break
                 path_taken.append(current_pos)
+                visited_in_walk[current_pos[1] * width + current_pos[0]] = 1
+                recent_positions.append(current_pos)
 
             if path_taken[-1] == goal_pos:
                 if best_path_found is None or len(path_taken) < len(best_path_found):
-                    best_path_found = list(path_taken)
+                    # Cada iteración crea su propia lista y esta ya no se modifica: no hace falta copiarla
+                    best_path_found = path_taken
 
+                # path_taken siempre incluye el inicio (path_len >= 1): no hace falta epsilon en el divisor
                 path_len = len(path_taken)
-                for idx, pos_in_path in enumerate(path_taken):
-                    reinforcement = (1.0 / (path_len + 1e-5)) * (path_len - idx) * 15.0
-                    self.avatar_heat_map[pos_in_path[1], pos_in_path[0]] += reinforcement
+                reinforcement_scale = 15.0 / path_len
+                # Refuerzo de todo el recorrido en una sola operación; np.add.at acumula las
+                # casillas repetidas (la asignación con índices repetidos se quedaría con una)
+                path_coords = np.array(path_taken, dtype=np.intp)
+                reinforcements = np.arange(path_len, 0, -1) * reinforcement_scale
+                np.add.at(self.avatar_heat_map, (path_coords[:, 1], path_coords[:, 0]), reinforcements)
 
         if callback:
             callback(iterations, iterations, None, best_path_found, 100.0, is_final=True)
@@ -132,7 +209,7 @@ class HeatMapPathfinding:
             if obstacles is None:
                 print("Error: Obstáculos no provistos para entrenamiento ad-hoc de heatmap.")
                 return None
-            current_enemies_for_adhoc = set(enemy_positions_set) if enemy_positions_set is not None else set()
+            current_enemies_for_adhoc = enemy_positions_set if enemy_positions_set is not None else set()
             # print(f"Find_path: Heatmap vacío, entrenando ad-hoc con {len(current_enemies_for_adhoc)} enemigos considerados.") # Para depuración
             self.train(start_pos, goal_pos, obstacles, current_enemies_for_adhoc, iterations=200, callback=None)
             if not self.avatar_heat_map.any():
@@ -140,12 +217,36 @@ class HeatMapPathfinding:
                 return None
             heatmap_to_use = self.avatar_heat_map
 
+        # Celdas como enteros x * height + y: índices planos sin hashear tuplas y con el
+        # mismo orden que las tuplas (x, y), así los empates del heap se resuelven igual
+        height = self.height
+        width = self.width
+        goal_x, goal_y = goal_pos
+        # Inicio y meta fuera del grid se empaquetarían como otra celda válida o fuera de las
+        # listas; validarlos aquí es lo que permite expandir vecinos sin comprobar límites
+        start_x, start_y = start_pos
+        if not (0 <= goal_x < width and 0 <= goal_y < height and 0 <= start_x < width and 0 <= start_y < height):
+            return None
+        goal_cell = goal_x * height + goal_y
+        start_cell = start_x * height + start_y
+
+        neighbor_offsets = _neighbor_offsets(width, height)
+
         pq = []
         initial_h_cost = self.manhattan_distance(start_pos, goal_pos)
-        heapq.heappush(pq, (initial_h_cost, 0, start_pos))
-
-        came_from = {start_pos: None}
-        cost_so_far = {start_pos: 0}
+        heapq.heappush(pq, (initial_h_cost, 0, start_cell))
+
+        # Listas planas indexadas por celda; -1 marca "sin padre" e inf "sin coste conocido"
+        came_from = self._search_came_from
+        cost_so_far = self._search_cost
+        touched = self._search_touched
+        unreached = float('inf')
+        for cell in touched:
+            came_from[cell] = -1
+            cost_so_far[cell] = unreached
+        touched.clear()
+        cost_so_far[start_cell] = 0
+        touched.append(start_cell)
 
         max_exploration_nodes = self.width * self.height * 2
         nodes_explored = 0
@@ -153,23 +254,36 @@ class HeatMapPathfinding:
         while pq and nodes_explored < max_exploration_nodes:
             nodes_explored += 1
             f_cost_current_node, g_cost_current, current = heapq.heappop(pq)
-
-            if current == goal_pos:
-                path = []
+            # Entrada superada por un costo menor: la celda ya se expandió con ese costo
+            if g_cost_current > cost_so_far[current]:
+                continue
+
+            if current == goal_cell:
+                # Los costos no son unitarios: se cuenta el largo en una primera pasada y se
+                # llena la lista desde el final, sin append ni inversión
+                path_length = 0
+                temp = current
+                while temp != -1:
+                    path_length += 1
+                    temp = came_from[temp]
+                path = [None] * path_length
                 temp = current
-                while temp is not None:
-                    path.append(temp)
+                for index in range(path_length - 1, -1, -1):
+                    path[index] = divmod(temp, height)
                     temp = came_from[temp]
-                return path[::-1]
+                return path
+
+            for offset in neighbor_offsets[current]:
+                neighbor = current + offset
+                nx, ny = divmod(neighbor, height)
+                if neighbor != goal_cell and (nx, ny) in obstacles_set:
+                    continue
 
-            for neighbor in self._get_neighbors(current, obstacles_set, target_goal=goal_pos):
-                heat_val = 0
-                if 0 <= neighbor[1] < self.height and 0 <= neighbor[0] < self.width:
-                    heat_val = heatmap_to_use[neighbor[1], neighbor[0]]
+                heat_val = heatmap_to_use[ny, nx]
 
                 base_movement_cost = 1.0
 
-                if neighbor == goal_pos:
+                if neighbor == goal_cell:
                     step_cost = 0.01
                 else:
                     heat_influence_factor = 0.5
@@ -178,9 +292,11 @@ class HeatMapPathfinding:
 
                 new_g_cost = g_cost_current + step_cost
 
-                if neighbor not in cost_so_far or new_g_cost < cost_so_far[neighbor]:
+                if new_g_cost < cost_so_far[neighbor]:
+                    if cost_so_far[neighbor] == unreached:
+                        touched.append(neighbor)
                     cost_so_far[neighbor] = new_g_cost
-                    priority = new_g_cost + self.manhattan_distance(neighbor, goal_pos)
+                    priority = new_g_cost + abs(nx - goal_x) + abs(ny - goal_y)
                     heapq.heappush(pq, (priority, new_g_cost, neighbor))
                     came_from[neighbor] = current
         return None
@@ -189,7 +305,8 @@ class HeatMapPathfinding:
         if not self.avatar_heat_map.any():
             return False
 
-        current_params = (player_start_pos, goal_pos, tuple(sorted(list(obstacles))), num_enemies)
+        # frozenset: clave independiente del orden sin ordenar las posiciones en cada llamada
+        current_params = (player_start_pos, goal_pos, frozenset(obstacles), num_enemies)
         if current_params == self.last_analysis_params:
             return True
 
@@ -198,7 +315,7 @@ class HeatMapPathfinding:
         self.choke_points = []
         self.safe_zones = []
 
-        obstacles_set = set(obstacles)
+        obstacles_set = obstacles if isinstance(obstacles, set) else set(obstacles)
         best_path_player_ref = self.find_path_with_heat_map(player_start_pos, goal_pos, obstacles_set,
                                                             enemy_positions_set=set(), is_avatar=True)
 
@@ -253,11 +370,15 @@ class HeatMapPathfinding:
 
     def visualize_heat_map(self, start_pos=None, goal_pos=None, path=None, obstacles_vis=None, title="Heatmap",
                            is_avatar=True, show=True, save_path=None):
+        if not show and not save_path: return None  # Nada que mostrar ni guardar
         heatmap_to_display = self.avatar_heat_map if is_avatar else self.enemy_heat_map
         if not heatmap_to_display.any():
             print(f"Visualize HM: Heatmap {'Avatar' if is_avatar else 'Enemigo'} está vacío.")
             return
 
+        # Import diferido: el entrenamiento y la búsqueda no necesitan matplotlib
+        import matplotlib.pyplot as plt
+
         plt.figure(figsize=(max(8, self.width * 0.4), max(6, self.height * 0.4)))
 
         vmin_plot, vmax_plot = np.min(heatmap_to_display), np.max(heatmap_to_display)
@@ -268,8 +389,8 @@ class HeatMapPathfinding:
         plt.colorbar(label="Valor del Heatmap")
 
         if obstacles_vis:
-            obs_x = [o[0] for o in obstacles_vis]
-            obs_y = [o[1] for o in obstacles_vis]
+            # Columnas x/y de un único array contiguo en vez de recorrer las tuplas dos veces
+            obs_x, obs_y = np.array(list(obstacles_vis), dtype=np.int32).T
             plt.scatter(obs_x, obs_y, marker='s', s=60, color='black', alpha=0.7, label='Obstáculos')
 
         if start_pos:
@@ -280,8 +401,7 @@ class HeatMapPathfinding:
                         label='Meta', zorder=5)
 
         if path:
-            path_x = [p[0] for p in path]
-            path_y = [p[1] for p in path]
+            path_x, path_y = np.asarray(path, dtype=np.int32).T
             plt.plot(path_x, path_y, 'w--', linewidth=2.5, label='Camino')
 
         plt.title(title, fontsize=14)
@@ -6,10 +6,33 @@ import numpy as np
 
 
 class GameRenderer:
+    # Definiciones fijas de la barra lateral: se construyen una vez, no en cada frame
+    SIDEBAR_BUTTON_DEFINITIONS = (
+        ("start", "Iniciar/Detener (Space)"), ("reset", "Reiniciar Juego (R)"),
+        ("train_player_agent", "Ent. Agente Jugador (H)"),
+        ("train_enemy_agent", "Ent. Agente Enemigo (Q)"),
+        ("stop_train", "Detener Entrenamientos"),
+        ("edit_player", "Editar Pos Jugador (P)"), ("edit_house", "Editar Pos Casa (C)"),
+        ("edit_obstacles", "Editar Obstáculos (O)"), ("edit_enemies", "Editar Enemigos (E)"),
+        ("clear_obstacles", "Limpiar Obstáculos"), ("clear_enemies", "Limpiar Enemigos"),
+        ("use_heat_map", "Jugador Sigue Heatmap (N)"),
+        ("visualize_heat_map", "Ver Heatmap Avatar (V)"),
+        ("reset_heat_map", "Resetear Heatmap Av."),
+        ("toggle_edit_avatar_heatmap_iters", "Iter HM Av: ...")
+    )
+    TEXT_CACHE_MAX_ENTRIES = 256
+
     def __init__(self, screen, game_instance):
         self.screen = screen
         self.game = game_instance
         self.button_rects = {}
+        self._fonts = {}
+        self._text_surfaces = {}
+        # Capa con todos los obstáculos; se regenera solo cuando cambia obstacles_version
+        self._obstacle_layer = None
+        self._obstacle_layer_version = None
+        # Fondo estático (color + líneas de la cuadrícula), se dibuja una sola vez
+        self._background = None
 
         self.player_img = self._load_image(GameConfig.PLAYER_IMAGE)
         self.house_img = self._load_image(GameConfig.HOUSE_IMAGE)
@@ -38,17 +61,34 @@ class GameRenderer:
                 fallback_surf.fill(GameConfig.WHITE)
             return fallback_surf
 
+    def _get_font(self, size):
+        font = self._fonts.get(size)
+        if font is None:
+            font = self._fonts[size] = pygame.font.SysFont(None, size)
+        return font
+
+    def _render_text(self, size, text, color, background=None):
+        # Los textos de la UI se repiten frame a frame: se rasterizan una sola vez
+        key = (size, text, color, background)
+        text_surf = self._text_surfaces.get(key)
+        if text_surf is None:
+            if len(self._text_surfaces) >= self.TEXT_CACHE_MAX_ENTRIES:
+                self._text_surfaces.clear()
+            text_surf = self._get_font(size).render(text, True, color, background)
+            self._text_surfaces[key] = text_surf
+        return text_surf
+
     def render(self):
-        self.screen.fill(GameConfig.GRID_BG)
-        self._draw_grid_lines()
+        if self._background is None:
+            self._background = pygame.Surface(self.screen.get_size())
+            self._background.fill(GameConfig.GRID_BG)
+            self._draw_grid_lines(self._background)
+        self.screen.blit(self._background, (0, 0))
 
         if self.game.avatar_heatmap_trained and hasattr(self.game, 'heat_map_pathfinder'):
             self._draw_avatar_learned_heatmap()
 
-        if GameConfig.SHOW_MOVEMENT_MATRIX and \
-                hasattr(self.game, 'player_movement_frequency_matrix') and \
-                self.game.player_movement_frequency_matrix is not None and \
-                self.game.player_movement_frequency_matrix.any():
+        if GameConfig.SHOW_MOVEMENT_MATRIX and getattr(self.game, 'player_movement_frequency_max', 0) > 0:
             self._draw_player_frequency_heatmap()
 
         self._draw_game_obstacles()
@@ -72,12 +112,12 @@ class GameRenderer:
 
         self._draw_ui_sidebar()
 
-    def _draw_grid_lines(self):
+    def _draw_grid_lines(self, target_surface):
         for x_l in range(0, GameConfig.GRID_WIDTH * GameConfig.SQUARE_SIZE + 1, GameConfig.SQUARE_SIZE):
-            pygame.draw.line(self.screen, GameConfig.GRID_COLOR, (x_l, 0),
+            pygame.draw.line(target_surface, GameConfig.GRID_COLOR, (x_l, 0),
                              (x_l, GameConfig.GRID_HEIGHT * GameConfig.SQUARE_SIZE))
         for y_l in range(0, GameConfig.GRID_HEIGHT * GameConfig.SQUARE_SIZE + 1, GameConfig.SQUARE_SIZE):
-            pygame.draw.line(self.screen, GameConfig.GRID_COLOR, (0, y_l),
+            pygame.draw.line(target_surface, GameConfig.GRID_COLOR, (0, y_l),
                              (GameConfig.GRID_WIDTH * GameConfig.SQUARE_SIZE, y_l))
 
     def _draw_avatar_learned_heatmap(self):
@@ -106,8 +146,7 @@ class GameRenderer:
 
     def _draw_player_frequency_heatmap(self):
         player_freq_matrix = self.game.player_movement_frequency_matrix
-        if not player_freq_matrix.any(): return
-        max_player_freq_val = np.max(player_freq_matrix)
+        max_player_freq_val = self.game.player_movement_frequency_max
         if max_player_freq_val == 0: return
 
         for r_f_idx_player in range(GameConfig.GRID_HEIGHT):
@@ -135,11 +174,21 @@ class GameRenderer:
                         self.screen.blit(text_visits_num, text_visits_rect_num)
 
     def _draw_game_obstacles(self):
-        for obs_p_tuple in self.game.game_state.obstacles:
-            obs_render_rect = pygame.Rect(obs_p_tuple[0] * GameConfig.SQUARE_SIZE,
-                                          obs_p_tuple[1] * GameConfig.SQUARE_SIZE, GameConfig.SQUARE_SIZE,
-                                          GameConfig.SQUARE_SIZE)
-            pygame.draw.rect(self.screen, GameConfig.OBSTACLE_COLOR, obs_render_rect)
+        game_state = self.game.game_state
+        # Comparar un entero por frame en vez de hashear el conjunto de obstáculos
+        if self._obstacle_layer is None or game_state.obstacles_version != self._obstacle_layer_version:
+            obstacle_layer = pygame.Surface(
+                (GameConfig.GRID_WIDTH * GameConfig.SQUARE_SIZE, GameConfig.GRID_HEIGHT * GameConfig.SQUARE_SIZE),
+                pygame.SRCALPHA)
+            for obs_p_tuple in game_state.obstacles:
+                obs_render_rect = pygame.Rect(obs_p_tuple[0] * GameConfig.SQUARE_SIZE,
+                                              obs_p_tuple[1] * GameConfig.SQUARE_SIZE, GameConfig.SQUARE_SIZE,
+                                              GameConfig.SQUARE_SIZE)
+                pygame.draw.rect(obstacle_layer, GameConfig.OBSTACLE_COLOR, obs_render_rect)
+            self._obstacle_layer = obstacle_layer
+            self._obstacle_layer_version = game_state.obstacles_version
+        # Un solo blit por frame en vez de un draw.rect por obstáculo
+        self.screen.blit(self._obstacle_layer, (0, 0))
 
     def _draw_all_enemies(self):
         if hasattr(self.game.game_state, 'enemies') and isinstance(self.game.game_state.enemies, dict):
@@ -219,8 +268,7 @@ class GameRenderer:
                 pygame.draw.line(self.screen, path_line_rgb_color, start_center_pixels, end_center_pixels, line_width)
 
     def _draw_victory_message(self):
-        font_vic = pygame.font.SysFont(None, 60)
-        text_vic = font_vic.render("¡FELICIDADES!", True, GameConfig.GREEN, GameConfig.DARK_GRAY)
+        text_vic = self._render_text(60, "¡FELICIDADES!", GameConfig.GREEN, GameConfig.DARK_GRAY)
         rect_vic = text_vic.get_rect(centerx=(GameConfig.GRID_WIDTH * GameConfig.SQUARE_SIZE) // 2,
                                      centery=(GameConfig.GRID_HEIGHT * GameConfig.SQUARE_SIZE) // 3)
         overlay_surface = pygame.Surface(
@@ -229,14 +277,12 @@ class GameRenderer:
         overlay_surface.fill((0, 0, 0, 180))
         self.screen.blit(overlay_surface, (0, 0))
         self.screen.blit(text_vic, rect_vic)
-        font_instr_restart = pygame.font.SysFont(None, 30)
-        text_instr_restart = font_instr_restart.render("Presiona 'R' para reiniciar", True, GameConfig.WHITE)
+        text_instr_restart = self._render_text(30, "Presiona 'R' para reiniciar", GameConfig.WHITE)
         rect_instr_restart = text_instr_restart.get_rect(centerx=rect_vic.centerx, top=rect_vic.bottom + 20)
         self.screen.blit(text_instr_restart, rect_instr_restart)
 
     def _draw_game_over_message(self):
-        font_gameover = pygame.font.SysFont(None, 70)
-        text_gameover = font_gameover.render("GAME OVER", True, GameConfig.RED, GameConfig.BLACK)
+        text_gameover = self._render_text(70, "GAME OVER", GameConfig.RED, GameConfig.BLACK)
         rect_gameover = text_gameover.get_rect(centerx=(GameConfig.GRID_WIDTH * GameConfig.SQUARE_SIZE) // 2,
                                                centery=(GameConfig.GRID_HEIGHT * GameConfig.SQUARE_SIZE) // 2)
 
@@ -248,8 +294,7 @@ class GameRenderer:
 
         self.screen.blit(text_gameover, rect_gameover)
 
-        font_instr_restart = pygame.font.SysFont(None, 30)
-        text_instr_restart = font_instr_restart.render("Presiona 'R' para reiniciar", True, GameConfig.WHITE)
+        text_instr_restart = self._render_text(30, "Presiona 'R' para reiniciar", GameConfig.WHITE)
         rect_instr_restart = text_instr_restart.get_rect(centerx=rect_gameover.centerx, top=rect_gameover.bottom + 20)
         self.screen.blit(text_instr_restart, rect_instr_restart)
 
@@ -261,33 +306,16 @@ class GameRenderer:
         mouse_current_pos = pygame.mouse.get_pos()
         mouse_left_button_pressed, _, _ = pygame.mouse.get_pressed()
 
-        font_buttons_sidebar = pygame.font.SysFont(None, 20)
-        font_titles_sidebar = pygame.font.SysFont(None, 24)
-
-        main_title_surf = font_titles_sidebar.render("Control Juego IA", True, GameConfig.WHITE)
+        main_title_surf = self._render_text(24, "Control Juego IA", GameConfig.WHITE)
         main_title_ui_rect = main_title_surf.get_rect(centerx=sidebar_full_rect.centerx, top=10)
         self.screen.blit(main_title_surf, main_title_ui_rect)
 
-        sidebar_button_definitions = [
-            ("start", "Iniciar/Detener (Space)"), ("reset", "Reiniciar Juego (R)"),
-            ("train_player_agent", "Ent. Agente Jugador (H)"),
-            ("train_enemy_agent", "Ent. Agente Enemigo (Q)"),
-            ("stop_train", "Detener Entrenamientos"),
-            ("edit_player", "Editar Pos Jugador (P)"), ("edit_house", "Editar Pos Casa (C)"),
-            ("edit_obstacles", "Editar Obstáculos (O)"), ("edit_enemies", "Editar Enemigos (E)"),
-            ("clear_obstacles", "Limpiar Obstáculos"), ("clear_enemies", "Limpiar Enemigos"),
-            ("use_heat_map", "Jugador Sigue Heatmap (N)"),
-            ("visualize_heat_map", "Ver Heatmap Avatar (V)"),
-            ("reset_heat_map", "Resetear Heatmap Av."),
-            ("toggle_edit_avatar_heatmap_iters", f"Iter HM Av: ...")
-        ]
-
         button_y_start_offset = main_title_ui_rect.bottom + 20
         button_render_height = 26
         button_vertical_margin = 7
         self.button_rects.clear()
 
-        for i, (button_id_str, button_text_str) in enumerate(sidebar_button_definitions):
+        for i, (button_id_str, button_text_str) in enumerate(self.SIDEBAR_BUTTON_DEFINITIONS):
             current_button_rect = pygame.Rect(
                 sidebar_full_rect.left + button_vertical_margin,
                 button_y_start_offset + i * (button_render_height + button_vertical_margin),
@@ -326,7 +354,7 @@ class GameRenderer:
             if mouse_is_over_button and not button_is_being_clicked and not is_active_input_field:
                 pygame.draw.rect(self.screen, GameConfig.BUTTON_FOCUS, current_button_rect, 1, border_radius=4)
 
-            text_surf_for_button = font_buttons_sidebar.render(current_text_to_display, True, button_text_color)
+            text_surf_for_button = self._render_text(20, current_text_to_display, button_text_color)
             text_rect_for_button = text_surf_for_button.get_rect(center=current_button_rect.center)
             if button_is_being_clicked and not is_active_input_field: text_rect_for_button.y += 1
             self.screen.blit(text_surf_for_button, text_rect_for_button)
@@ -98,6 +98,56 @@ def test_enemy_avoidance_pathfinding():
         print("❌ No se encontró ningún camino")
         return False
 
+def test_bidirectional_path_matches_astar():
+    """
+    Comprueba que la búsqueda bidireccional devuelve caminos válidos y de la misma
+    longitud que el A* unidireccional, tanto con camino disponible como sin él.
+    """
+    game_state = GameState(GameConfig.GRID_WIDTH, GameConfig.GRID_HEIGHT)
+    # Muro vertical con un único hueco que obliga a rodear
+    game_state.obstacles = {(10, y) for y in range(GameConfig.GRID_HEIGHT) if y != 3}
+    astar = AStar(game_state)
+
+    for start, goal in [((0, 0), (GameConfig.GRID_WIDTH - 1, GameConfig.GRID_HEIGHT - 1)),
+                        ((2, 10), (15, 10)), ((5, 5), (5, 5)), ((9, 3), (11, 3))]:
+        path = astar.find_path(start, goal)
+        bidir_path = astar.find_path_bidir(start, goal)
+        assert path is not None and bidir_path is not None
+        assert len(bidir_path) == len(path)
+        assert bidir_path[0] == start and bidir_path[-1] == goal
+        for (x1, y1), (x2, y2) in zip(bidir_path, bidir_path[1:]):
+            assert abs(x1 - x2) + abs(y1 - y2) == 1
+            assert astar.is_position_valid((x2, y2))
+
+    # Cerrar el hueco: ninguna de las dos búsquedas debe encontrar camino
+    game_state.obstacles.add((10, 3))
+    astar = AStar(game_state)
+    assert astar.find_path((2, 10), (15, 10)) is None
+    assert astar.find_path_bidir((2, 10), (15, 10)) is None
+
+
+def test_find_path_cache_follows_blocked_positions():
+    """
+    Comprueba que los caminos memorizados se devuelven como listas independientes y
+    que se descartan cuando se recalculan las posiciones bloqueadas.
+    """
+    game_state = GameState(GameConfig.GRID_WIDTH, GameConfig.GRID_HEIGHT)
+    astar = AStar(game_state)
+    start, goal = (0, 0), (6, 0)
+
+    first = astar.find_path(start, goal)
+    second = astar.find_path(start, goal)
+    assert first == second and first is not second
+    first.pop()  # Modificar el resultado no debe alterar la caché
+    assert astar.find_path(start, goal) == second
+
+    # Un muro en la fila 0 obliga a rodear: el camino memorizado ya no sirve
+    game_state.obstacles = {(3, 0), (3, 1)}
+    astar.blocked_positions = astar._calculate_blocked_positions()
+    detour = astar.find_path(start, goal)
+    assert detour is not None and len(detour) > len(second)
+    assert (3, 0) not in detour and (3, 1) not in detour
+
 if __name__ == "__main__":
     result = test_enemy_avoidance_pathfinding()
     print(f"\nResultado de la prueba: {'✅ PASÓ' if result else '❌ FALLÓ'}")
@@ -0,0 +1,93 @@
+import numpy as np
+from DecisionTree import DecisionTree
+from GameState import GameState
+from config import GameConfig
+
+
+def _make_tree(obstacles=()):
+    """
+    Crea un árbol de decisiones sobre un estado de juego con los obstáculos dados y una
+    matriz de movimiento vacía.
+    """
+    game_state = GameState(GameConfig.GRID_WIDTH, GameConfig.GRID_HEIGHT)
+    game_state.obstacles = set(obstacles)
+    movement_matrix = np.zeros((GameConfig.GRID_HEIGHT, GameConfig.GRID_WIDTH))
+    return DecisionTree(game_state, movement_matrix)
+
+
+def _assert_valid_path(path, start, goal, obstacles):
+    assert path[0] == start and path[-1] == goal
+    for (x1, y1), (x2, y2) in zip(path, path[1:]):
+        assert abs(x1 - x2) + abs(y1 - y2) == 1
+        assert 0 <= x2 < GameConfig.GRID_WIDTH and 0 <= y2 < GameConfig.GRID_HEIGHT
+        assert (x2, y2) not in obstacles
+
+
+def test_find_path_reaches_goal_with_connected_path():
+    """
+    Comprueba que, sin obstáculos, el camino llega a la meta con pasos ortogonales y es
+    de longitud mínima (distancia Manhattan).
+    """
+    tree = _make_tree()
+    for start, goal in [((5, 5), (9, 8)), ((0, 0), (3, 0)), ((20, 10), (16, 14)), ((7, 7), (7, 7))]:
+        path = tree.find_path(start, goal)
+        _assert_valid_path(path, start, goal, set())
+        assert len(path) - 1 == abs(start[0] - goal[0]) + abs(start[1] - goal[1])
+
+
+def test_find_path_avoids_obstacles():
+    """
+    Comprueba que el camino rodea un muro en lugar de atravesarlo.
+    """
+    # Muro vertical en x = 8 con un único hueco en y = 3
+    obstacles = {(8, y) for y in range(0, 9) if y != 3}
+    tree = _make_tree(obstacles)
+    start, goal = (6, 6), (10, 6)
+    path = tree.find_path(start, goal)
+    _assert_valid_path(path, start, goal, obstacles)
+    assert (8, 3) in path
+
+
+def test_find_path_unreachable_goal_returns_start():
+    """
+    Comprueba que una meta encerrada por obstáculos devuelve [start] sin superar
+    max_depth, y que una meta a más de max_depth pasos también.
+    """
+    goal = (12, 12)
+    obstacles = {(11, 12), (13, 12), (12, 11), (12, 13)}
+    tree = _make_tree(obstacles)
+    assert tree.find_path((10, 10), goal) == [(10, 10)]
+    assert tree.find_path((0, 0), (tree.max_depth + 1, 0)) == [(0, 0)]
+
+
+def test_find_path_does_not_leak_visited_state():
+    """
+    Comprueba que cada búsqueda deja la rejilla visited en ceros, de modo que repetir
+    una búsqueda (tras una exitosa o una fallida) da el mismo resultado.
+    """
+    obstacles = {(8, y) for y in range(0, 9) if y != 3}
+    tree = _make_tree(obstacles | {(21, 20), (23, 20), (22, 19), (22, 21)})
+    start, goal = (6, 6), (10, 6)
+
+    first = tree.find_path(start, goal)
+    assert not any(tree.visited)
+    assert tree.find_path((20, 18), (22, 20)) == [(20, 18)]
+    assert not any(tree.visited)
+    assert tree.find_path(start, goal) == first
+    assert not any(tree.visited)
+
+
+def test_prioritized_neighbors_expands_all_directions():
+    """
+    Comprueba que se generan los cuatro vecinos ortogonales válidos (sin elegir una
+    dirección al azar), ordenados por la puntuación heurística y de forma determinista.
+    """
+    tree = _make_tree({(5, 4)})
+    tree.find_path((5, 5), (5, 5))  # Prepara las rejillas de obstáculos y visitas
+    neighbors = tree._get_prioritized_neighbors((5, 5), (9, 5))
+    assert neighbors[0] == (6, 5)
+    assert sorted(neighbors) == [(4, 5), (5, 6), (6, 5)]
+    assert all(tree._get_prioritized_neighbors((5, 5), (9, 5)) == neighbors for _ in range(5))
+
+    # En una esquina solo quedan los vecinos dentro del grid
+    assert sorted(tree._get_prioritized_neighbors((0, 0), (9, 5))) == [(0, 1), (1, 0)]
@@ -0,0 +1,101 @@
+import heapq
+import numpy as np
+from HeatMapPathfinding import HeatMapPathfinding
+
+
+def _reference_heat_map_path(pathfinder, start_pos, goal_pos, obstacles):
+    """
+    Búsqueda de referencia con tuplas (x, y) y diccionarios, equivalente a
+    find_path_with_heat_map antes de pasar a celdas enteras y listas planas.
+    """
+    pq = [(pathfinder.manhattan_distance(start_pos, goal_pos), 0, start_pos)]
+    came_from = {start_pos: None}
+    cost_so_far = {start_pos: 0}
+    nodes_explored = 0
+
+    while pq and nodes_explored < pathfinder.width * pathfinder.height * 2:
+        nodes_explored += 1
+        _, g_cost_current, current = heapq.heappop(pq)
+        if current == goal_pos:
+            path = []
+            while current is not None:
+                path.append(current)
+                current = came_from[current]
+            return path[::-1]
+
+        for neighbor in pathfinder._get_neighbors(current, obstacles, target_goal=goal_pos):
+            if neighbor == goal_pos:
+                step_cost = 0.01
+            else:
+                heat_val = pathfinder.avatar_heat_map[neighbor[1], neighbor[0]]
+                step_cost = max(0.1, 1.0 - heat_val * 0.5 * 0.01)
+            new_g_cost = g_cost_current + step_cost
+            if neighbor not in cost_so_far or new_g_cost < cost_so_far[neighbor]:
+                cost_so_far[neighbor] = new_g_cost
+                priority = new_g_cost + pathfinder.manhattan_distance(neighbor, goal_pos)
+                heapq.heappush(pq, (priority, new_g_cost, neighbor))
+                came_from[neighbor] = current
+    return None
+
+
+def _make_pathfinder(width=12, height=9):
+    """
+    Crea un buscador con un mapa de calor no trivial (sin entrenamiento ad-hoc) y un muro
+    con un hueco que obliga a rodear.
+    """
+    pathfinder = HeatMapPathfinding(width, height)
+    pathfinder.avatar_heat_map[:] = np.random.default_rng(0).random((height, width)) * 300
+    obstacles = {(5, y) for y in range(height) if y != 6} | {(8, 2), (8, 3), (9, 3)}
+    return pathfinder, obstacles
+
+
+def test_find_path_off_grid_goal_returns_none():
+    """
+    Comprueba que una meta fuera del grid devuelve None en lugar de confundirse con
+    otra celda al empaquetar sus coordenadas.
+    """
+    pathfinder, obstacles = _make_pathfinder()
+    for goal in [(12, 0), (0, 9), (-1, 4), (3, -2)]:
+        assert pathfinder.find_path_with_heat_map((1, 1), goal, obstacles, set()) is None
+
+
+def test_find_path_off_grid_start_returns_none():
+    """
+    Comprueba que un inicio fuera del grid devuelve None en lugar de leer otra celda
+    (o salirse de los buffers) al empaquetar sus coordenadas.
+    """
+    pathfinder, obstacles = _make_pathfinder()
+    for start in [(12, 0), (0, 9), (-1, 4), (3, -2), (40, 40)]:
+        assert pathfinder.find_path_with_heat_map(start, (8, 6), obstacles, set()) is None
+
+
+def test_find_path_repeated_calls_reuse_buffers():
+    """
+    Comprueba que dos llamadas seguidas sobre la misma instancia devuelven el mismo
+    camino: los buffers reutilizados se limpian entre búsquedas.
+    """
+    pathfinder, obstacles = _make_pathfinder()
+    first = pathfinder.find_path_with_heat_map((0, 0), (11, 8), obstacles, set())
+    second = pathfinder.find_path_with_heat_map((0, 0), (11, 8), obstacles, set())
+    assert first is not None and first == second
+    assert first[0] == (0, 0) and first[-1] == (11, 8)
+
+    # Una búsqueda distinta en medio tampoco debe dejar restos en los buffers
+    pathfinder.find_path_with_heat_map((11, 0), (0, 8), obstacles, set())
+    assert pathfinder.find_path_with_heat_map((0, 0), (11, 8), obstacles, set()) == first
+
+
+def test_find_path_matches_reference_search():
+    """
+    Comprueba que el camino coincide exactamente con el de la búsqueda de referencia
+    con tuplas, incluidos los empates, en un grid pequeño con obstáculos.
+    """
+    pathfinder, obstacles = _make_pathfinder()
+    for start, goal in [((0, 0), (11, 8)), ((2, 7), (10, 1)), ((11, 4), (0, 4)), ((4, 6), (9, 2)),
+                        ((0, 0), (5, 3))]:
+        path = pathfinder.find_path_with_heat_map(start, goal, obstacles, set())
+        assert path == _reference_heat_map_path(pathfinder, start, goal, obstacles)
+        assert path is not None
+        for (x1, y1), (x2, y2) in zip(path, path[1:]):
+            assert abs(x1 - x2) + abs(y1 - y2) == 1
+            assert (x2, y2) not in obstacles or (x2, y2) == goal